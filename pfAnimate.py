@@ -0,0 +1,441 @@
+import os
+import numpy as np
+import pandas as pd
+import xarray as xr
+import matplotlib.pyplot as plt
+import matplotlib.gridspec as gridspec
+from matplotlib import animation
+from matplotlib import style
+from pfStats import ensemble_means, group_means, ensemble_quantiles, group_index, scatter_arrays, dense_points, snow_events
+from pfPanels import PANEL_BUILDERS, date_numbers, field_key
+from pfLoad import open_ensemble, lazy_points, in_memory, field_loader
+from pfProfile import NO_PROFILE
+
+# gridded fields shipped with the repo
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# swe panel shared by every view: both areas plus peak and melt markers
+SWE_SERIES = {
+    'kind': 'series',
+    'name': 'swe_series',
+    'background': [('swe_burned', 0.05), ('swe_unburned', 0.05)],
+    'progress': [
+        {'var': 'swe_unburned', 'color': 'tab:grey', 'alpha': 0.3, 'label': 'Unburned'},
+        {'var': 'swe_burned', 'color': 'C3', 'alpha': 0.5, 'label': 'Burned'}
+    ],
+    'markers': [
+        {'var': 'swe_burned', 'event': 'peak', 'offset': 60, 'marker': 'v', 'color': 'C3', 'off_alpha': 0.05},
+        {'var': 'swe_unburned', 'event': 'peak', 'offset': 60, 'marker': 'v', 'color': 'tab:grey', 'off_alpha': 0.1},
+        {'var': 'swe_burned', 'event': 'melted', 'offset': -60, 'marker': '^', 'color': 'C3', 'off_alpha': 0.05},
+        {'var': 'swe_unburned', 'event': 'melted', 'offset': -60, 'marker': '^', 'color': 'tab:grey', 'off_alpha': 0.05}
+    ]
+}
+
+def area_view(area, heading, swe_color):
+
+    # burned and unburned views differ only in variable suffix and colors
+    def scatter(name, y, color, title, ylabel=''):
+        return {
+            'kind': 'scatter',
+            'name': name,
+            'x': 'init_soil_burned',
+            'layers': [
+                {'y': y, 'group': 'MPD', 'color': color, 'marker': 'o', 'alpha': 0.6, 'label': 'MPD'},
+                {'y': y, 'group': 'NN', 'color': color, 'marker': 'x', 'alpha': 0.3, 'label': 'NN'},
+                {'y': y, 'group': 'R', 'color': color, 'marker': 's', 'alpha': 0.1, 'label': 'R'}
+            ],
+            'xlim': [278,295],
+            'ylim': [-25,25],
+            'ylabel': ylabel,
+            'title': title,
+            'xticks': [280,293],
+            'yticks': [-25,0,25],
+            'legend': {'loc': 'lower right', 'fontsize': 'x-small'}
+        }
+
+    def series(name, var, color):
+        return {
+            'kind': 'series',
+            'name': name,
+            'background': [(var, 0.2)],
+            'progress': [{'var': var, 'color': color, 'alpha': 0.5}],
+            'ylim': [-100,1000]
+        }
+
+    panels = [
+        {'kind': 'label', 'name': 'label', 'rows': slice(3,None), 'cols': slice(None), 'xlabel': 'Initial Soil Storage [mm]', 'labelpad': 25},
+        dict(series('runoff_series', 'net_runoff_' + area, 'C0'), rows = slice(0,3), cols = 0),
+        dict(series('soil_series', 'soil_' + area, 'C1'), rows = slice(0,3), cols = 1),
+        dict(series('et_series', 'et_' + area, 'C2'), rows = slice(0,3), cols = 2),
+        dict(SWE_SERIES, rows = slice(0,3), cols = 3, ylim = [-100,1000]),
+        dict(scatter('runoff_scatter', 'norm_net_runoff_' + area, 'C0', 'Net Runoff', 'Depth [mm]'), rows = slice(3,None), cols = 0),
+        dict(scatter('soil_scatter', 'norm_soil_' + area, 'C1', '$\Delta$ Soil Storage'), rows = slice(3,None), cols = 1),
+        dict(scatter('et_scatter', 'norm_et_' + area, 'C2', 'ET'), rows = slice(3,None), cols = 2),
+        dict(scatter('swe_scatter', 'norm_swe_' + area, swe_color, 'SWE'), rows = slice(3,None), cols = 3)
+    ]
+
+    return {
+        'figsize': [13,5],
+        'grid': [8,4],
+        'heading': heading,
+        'date_panel': 1,
+        'panels': panels
+    }
+
+WATERSHED_VIEW = {
+    'figsize': [12,6],
+    'grid': [4,4],
+    'heading': '',
+    'date_panel': 1,
+    'panels': [
+        {
+            'kind': 'scatter',
+            'name': 'scatter',
+            'rows': slice(None),
+            'cols': slice(0,2),
+            'x': 'downstream_cells',
+            'layers': [
+                {'y': 'norm_swe_watershed', 'color': 'C3', 'marker': 'o', 'alpha': 0.5, 'label': 'SWE'},
+                {'y': 'norm_et_watershed', 'color': 'C2', 'marker': 'o', 'alpha': 0.5, 'label': 'ET'},
+                {'y': 'norm_net_runoff_watershed', 'color': 'C0', 'marker': 'o', 'alpha': 0.5, 'label': 'Net Runoff'},
+                {'y': 'norm_soil_watershed', 'color': 'C1', 'marker': 'o', 'alpha': 0.5, 'label': '$\Delta$ Soil Storage'}
+            ],
+            'ylim': [-12.5,12.5],
+            'ylabel': 'Depth [mm]',
+            'xlabel': 'Fire Downstream Area [sq km]',
+            'xticks': [0,300],
+            'yticks': [-12,0,12],
+            'legend': {'loc': 'lower center'}
+        },
+        dict(SWE_SERIES, rows = 0, cols = slice(2,None), ylabel = 'SWE', legend = {'loc': 'center right'}),
+        {
+            'kind': 'series',
+            'name': 'runoff_series',
+            'rows': 1,
+            'cols': slice(2,None),
+            'background': [('net_runoff_watershed', 0.2)],
+            'progress': [{'var': 'net_runoff_watershed', 'color': 'C0', 'alpha': 0.5}],
+            'ylabel': 'Net\nRunoff'
+        },
+        {
+            'kind': 'series',
+            'name': 'soil_series',
+            'rows': 2,
+            'cols': slice(2,None),
+            'background': [('soil_watershed', 0.2)],
+            'progress': [{'var': 'soil_watershed', 'color': 'C1', 'alpha': 0.5}],
+            'ylabel': '$\Delta$ Soil\nStorage'
+        },
+        {
+            'kind': 'series',
+            'name': 'et_series',
+            'rows': 3,
+            'cols': slice(2,None),
+            'background': [('et_watershed', 0.2)],
+            'progress': [{'var': 'et_watershed', 'color': 'C2', 'alpha': 0.5}],
+            'ylabel': 'ET',
+            'bottom': True
+        }
+    ]
+}
+
+# ensemble mean initial storage map beside the watershed series
+SOIL_MAP_VIEW = dict(
+    WATERSHED_VIEW,
+    panels = [
+        {
+            'kind': 'map',
+            'name': 'soil_map',
+            'rows': slice(None),
+            'cols': slice(0,2),
+            'path': os.path.join(DATA_DIR, 'init_soil_xy.nc'),
+            'var': 'init_soil',
+            'reduce': 'mean',
+            'max_cells': 512,
+            'cmap': 'YlGnBu',
+            'colorbar': 'Initial Soil Storage [mm]',
+            'title': 'Ensemble Mean'
+        }
+    ] + WATERSHED_VIEW['panels'][1:]
+)
+
+VIEWS = {
+    'burned': area_view('burned', 'Burned Areas', 'C3'),
+    'unburned': area_view('unburned', 'Unburned Areas', 'tab:grey'),
+    'watershed': WATERSHED_VIEW,
+    'soil_map': SOIL_MAP_VIEW
+}
+
+# render settings: quick look vs full quality, same views and frames otherwise
+QUALITY = {
+    'final': {
+        'dpi': None,
+        'rasterized': False,
+        'simplify_threshold': None,
+        'point_stride': 1,
+        'frame_stride': 1
+    },
+    'preview': {
+        'dpi': 40,
+        'rasterized': True,
+        'simplify_threshold': 1.0,
+        'point_stride': 4,
+        'frame_stride': 5
+    }
+}
+
+def quality_settings(quality):
+
+    # a named preset, or a dict overriding the final settings
+    if isinstance(quality, str):
+        return QUALITY[quality]
+    return dict(QUALITY['final'], **quality)
+
+def precompute(ds, views, quality='final', bands=None, by_group=False):
+
+    # collect every series, scatter and marker the requested views need
+    variables = []
+    pairs = []
+    events = []
+    maps = []
+    for view in views:
+        for panel in VIEWS[view]['panels']:
+            if panel['kind'] == 'map':
+                maps.append(panel)
+            for layer in panel.get('layers', []):
+                pairs.append((panel['x'], layer['y']))
+            for var, alpha in panel.get('background', []):
+                variables.append(var)
+            for layer in panel.get('progress', []):
+                variables.append(layer['var'])
+            for marker in panel.get('markers', []):
+                events.append((marker['var'], marker['event']))
+    variables = list(dict.fromkeys(variables))
+    pairs = list(dict.fromkeys(pairs))
+    scatter = list(dict.fromkeys(var for pair in pairs for var in pair))
+    quality = quality_settings(quality)
+
+    # previews thin the scatter clouds; ensemble means always use every sample
+    sampled = ds.isel(sample=slice(None, None, quality['point_stride']))
+
+    # dates and frame count come from the model time axis
+    dates = pd.DatetimeIndex(ds.t.values)
+    if (dates == dates.normalize()).all():
+        labels = dates.strftime('%Y-%m-%d')
+    else:
+        labels = dates.strftime('%Y-%m-%d %H:%M')
+
+    # reduce the ensemble once for all views, including any swe series whose
+    # marker dates have to be detected
+    events = list(dict.fromkeys(events))
+    detect = [var for var, event in events if event not in ds[var].attrs]
+    means = ensemble_means(ds, list(dict.fromkeys(variables + detect)))
+
+    # swe peak and melt dates: hand annotations win, otherwise detect them
+    # on the ensemble mean series already in memory
+    markers = {}
+    detected = {}
+    steps = np.arange(len(dates))
+    for var, event in events:
+        if event in ds[var].attrs:
+            date = pd.Timestamp(ds[var].attrs[event])
+        else:
+            if var not in detected:
+                peak, melted = snow_events(xr.DataArray(means[var], dims='t'))
+                detected[var] = {'peak': dates[int(peak)], 'melted': dates[int(melted)]}
+            date = detected[var][event]
+        loc = min(dates.searchsorted(date), len(dates) - 1)
+        markers.setdefault(var, {})[event] = (date, loc, steps >= loc)
+
+    # gridded fields stay on disk; map panels read one 2-D slice at a time
+    files = {}
+    fields = {}
+    for panel in maps:
+        key = field_key(panel)
+        if key in fields:
+            continue
+        if panel.get('path'):
+            if panel['path'] not in files:
+                files[panel['path']] = open_ensemble(panel['path'])
+            source = files[panel['path']]
+        else:
+            source = ds
+        fields[key] = field_loader(
+            source[panel['var']],
+            select = panel.get('select'),
+            reduce = panel.get('reduce', 'mean'),
+            max_cells = panel.get('max_cells')
+        )
+
+    # dense scatter blocks in memory, one hyperslab per frame otherwise
+    if in_memory(sampled, scatter):
+        arrays = scatter_arrays(sampled, pairs)
+        points = dense_points(arrays, group_index(sampled))
+    else:
+        arrays = None
+        points = lazy_points(sampled, scatter)
+
+    # percentile bands under each progress fill, e.g. [(0.05,0.95),(0.25,0.75)]
+    progress = list(dict.fromkeys(
+        layer['var']
+        for view in views
+        for panel in VIEWS[view]['panels']
+        for layer in panel.get('progress', [])
+    ))
+    quantiles = {}
+    if bands:
+        levels = sorted(set(q for band in bands for q in band))
+        quantiles = ensemble_quantiles(ds, progress, levels)
+
+    # per sampling group mean series, reduced once for the whole animation
+    groups = {}
+    if by_group:
+        groups = group_means(ds, progress)
+
+    t = ds.t.values
+
+    return {
+        'ds': ds,
+        'means': means,
+        'arrays': arrays,
+        'points': points,
+        't': t,
+        'x': date_numbers(t),
+        'dates': dates,
+        'labels': labels,
+        'markers': markers,
+        'fields': fields,
+        'bands': bands or [],
+        'quantiles': quantiles,
+        'groups': list(ds.group.values) if by_group else [],
+        'group_means': groups,
+        'quality': quality
+    }
+
+def window_steps(window, dates):
+
+    # rolling window length in steps, given as a count or a duration like '30D'
+    if window is None or isinstance(window, (int, np.integer)):
+        return window
+    step = dates[1] - dates[0]
+    return max(int(pd.Timedelta(window) / step), 1)
+
+def build_panels(view, state, blit=False, window=None, profile=NO_PROFILE):
+
+    # figure, its panel axes in spec order, and separate data extraction and
+    # artist updates, so extraction can run ahead of drawing on another thread
+
+    spec = VIEWS[view]
+    labels = state['labels']
+    quality = state['quality']
+    window = window_steps(window, state['dates'])
+
+    # scrolling redraws ticks and background blocks, which blitting would leave stale
+    if window and blit:
+        raise ValueError('a rolling window needs full redraws, use blit=False')
+
+    # set style
+    style.use('seaborn-notebook')
+
+    # set up figure
+    fig = plt.figure(
+        tight_layout = True,
+        figsize = spec['figsize'],
+        dpi = quality['dpi']
+    )
+    gs = gridspec.GridSpec(*spec['grid'])
+
+    # paths pick up the simplification threshold when they are created
+    rc = {}
+    if quality['simplify_threshold'] is not None:
+        rc = {'path.simplify': True, 'path.simplify_threshold': quality['simplify_threshold']}
+
+    # build every panel once, keeping its per-frame extract and apply
+    axes = []
+    panels = []
+    with plt.rc_context(rc):
+        for panel in spec['panels']:
+            if window and panel['kind'] == 'series':
+                panel = dict(panel, window = window)
+            ax = fig.add_subplot(gs[panel['rows'],panel['cols']])
+            panels.append(PANEL_BUILDERS[panel['kind']](ax, panel, state, profile))
+            axes.append(ax)
+
+    # blitting only redraws axes, so the date has to live inside one
+    heading = spec['heading']
+    if blit:
+        if heading:
+            fig.suptitle(heading)
+        ax = axes[spec['date_panel']]
+        title = ax.text(
+            0, 1, labels[0],
+            transform = ax.transAxes,
+            va = 'top'
+        )
+        heading = ''
+    else:
+        if heading:
+            heading = heading + '\n'
+        title = fig.suptitle(heading + labels[0])
+
+    # panels never move between frames, so solve the layout once and freeze it
+    with profile.time('figure', 'layout'):
+        fig.tight_layout()
+        if hasattr(fig, 'set_layout_engine'):
+            fig.set_layout_engine('none')
+        else:
+            fig.set_tight_layout(False)
+
+    def extract(frame):
+
+        # plain arrays only; nothing here touches an artist
+        return [panel_extract(frame) for panel_extract, panel_apply in panels]
+
+    def apply(frame, data):
+
+        profile.frame = frame
+
+        artists = []
+        for (panel_extract, panel_apply), panel_data in zip(panels, data):
+            artists += panel_apply(frame, panel_data)
+
+        # update date
+        with profile.time('title', 'artists'):
+            title.set_text(heading + labels[frame])
+
+        return artists + [title]
+
+    return fig, axes, extract, apply
+
+def build_view(view, state, blit=False, window=None, profile=NO_PROFILE):
+
+    # single-threaded update: extract and apply back to back
+    fig, axes, extract, apply = build_panels(view, state, blit, window, profile)
+
+    def update(frame):
+        return apply(frame, extract(frame))
+
+    return fig, update
+
+def animate(ds, views=('burned','unburned','watershed'), blit=False, quality='final', window=None, bands=None, by_group=False, profile=NO_PROFILE):
+
+    # one data pass shared by every requested view
+    state = precompute(ds, views, quality, bands, by_group)
+
+    # skipped preview frames are held longer so playback keeps its pace
+    stride = state['quality']['frame_stride']
+
+    anims = {}
+    for view in views:
+        fig, update = build_view(view, state, blit, window, profile)
+        anims[view] = animation.FuncAnimation(
+            fig,
+            update,
+            frames = range(0, len(state['dates']), stride),
+            interval = 100 * stride,
+            blit = blit,
+            repeat = False
+        )
+        plt.close(fig)
+
+    return anims
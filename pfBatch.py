@@ -0,0 +1,190 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import glob
+import uuid
+import functools
+import matplotlib
+matplotlib.use('Agg')
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pfAnimate import VIEWS, quality_settings
+from pfLoad import open_ensemble
+from pfStream import stream
+
+try:
+    import dask
+except ImportError:
+    dask = None
+
+def scenario_paths(source):
+
+    # a directory of netcdf files, or a manifest listing one dataset per line
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, '*.nc')))
+
+    root = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source) as f:
+        for line in f:
+            line = line.split('#')[0].strip()
+            if line:
+                paths.append(os.path.join(root, line))
+
+    return paths
+
+@functools.lru_cache(maxsize=None)
+def _content_digest(path, size, mtime, block=2**20):
+
+    # content hash, read in blocks so large runs never sit in memory
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(block), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+def file_digest(path):
+
+    # memoized per file version, so a rewritten file is hashed again
+    info = os.stat(path)
+
+    return _content_digest(path, info.st_size, info.st_mtime_ns)
+
+def render_key(data_digest, view, settings):
+
+    # input data, the view spec and every render setting decide the artifact
+    digest = hashlib.sha256()
+    digest.update(data_digest.encode())
+    digest.update(repr(VIEWS[view]).encode())
+    for panel in VIEWS[view]['panels']:
+        if panel.get('path'):
+            digest.update(file_digest(panel['path']).encode())
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+
+    return digest.hexdigest()
+
+def _init_worker():
+
+    # a forked child inherits the parent's dask thread pool without its
+    # threads, so lazy reads in the worker must run on the calling thread
+    if dask is not None:
+        dask.config.set(scheduler='synchronous')
+
+def render_job(path, view, output, key, settings, cache_dir=None):
+
+    # one view of one scenario, rendered under a temporary name that keeps the
+    # extension ffmpeg picks the format from; the old key goes first and the
+    # new one is written only once the output is complete and in place
+    if os.path.exists(output + '.key'):
+        os.remove(output + '.key')
+    root, ext = os.path.splitext(output)
+    tmp = '%s.%s.tmp%s' % (root, uuid.uuid4().hex, ext)
+    ds = open_ensemble(path)
+    try:
+        stream(ds, view, tmp, cache_dir=cache_dir, **settings)
+        os.replace(tmp, output)
+    finally:
+        ds.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    with open(output + '.key', 'w') as f:
+        f.write(key)
+
+    return output
+
+def up_to_date(output, key):
+
+    # an artifact is reused only if it was rendered from the same key
+    try:
+        with open(output + '.key') as f:
+            return f.read() == key and os.path.exists(output)
+    except FileNotFoundError:
+        return False
+
+def batch(source, out_dir, views=('burned','unburned','watershed'), workers=None, ext='mp4', force=False, cache_dir=None, **settings):
+
+    # render every scenario and view whose inputs or settings changed
+    settings['quality'] = quality_settings(settings.get('quality', 'final'))
+    os.makedirs(out_dir, exist_ok=True)
+
+    jobs = []
+    skipped = []
+    for path in scenario_paths(source):
+        data_digest = file_digest(path)
+        scenario = os.path.splitext(os.path.basename(path))[0]
+        for view in views:
+            output = os.path.join(out_dir, '%s_%s.%s' % (scenario, view, ext))
+            key = render_key(data_digest, view, settings)
+            if not force and up_to_date(output, key):
+                skipped.append(output)
+            else:
+                jobs.append((path, view, output, key, settings, cache_dir))
+
+    # scenarios are independent, so each worker renders whole animations
+    rendered = []
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(render_job, *job): job for job in jobs}
+        for future in as_completed(futures):
+            output = futures[future][2]
+            try:
+                rendered.append(future.result())
+                print('rendered', output)
+            except Exception as e:
+                failed.append(output)
+                print('failed  ', output, '-', repr(e), file=sys.stderr)
+
+    return {'rendered': rendered, 'skipped': skipped, 'failed': failed}
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Render animations for a batch of scenario datasets.')
+    parser.add_argument('source', help='directory of .nc files or a manifest with one path per line')
+    parser.add_argument('out_dir')
+    parser.add_argument('--views', nargs='+', default=['burned','unburned','watershed'], choices=list(VIEWS))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--format', default='mp4', help='output extension, e.g. mp4 or gif')
+    parser.add_argument('--fps', type=int, default=10)
+    parser.add_argument('--dpi', type=int, default=None)
+    parser.add_argument('--quality', default='final', choices=['final','preview'])
+    parser.add_argument('--window', default=None, help='rolling window, in steps or as a duration like 30D')
+    parser.add_argument('--bands', nargs='+', default=None, help='percentile bands like 5-95 25-75')
+    parser.add_argument('--by-group', action='store_true', help='add per sampling group mean lines')
+    parser.add_argument('--threshold', type=float, default=None, help='adaptive keyframe threshold')
+    parser.add_argument('--cache-dir', default=None, help='per-frame cache shared across runs and scenarios')
+    parser.add_argument('--force', action='store_true', help='render even if an up-to-date artifact exists')
+    args = parser.parse_args()
+
+    bands = None
+    if args.bands:
+        bands = [tuple(float(p) / 100 for p in band.split('-')) for band in args.bands]
+
+    window = args.window
+    if window is not None and window.isdigit():
+        window = int(window)
+
+    result = batch(
+        args.source,
+        args.out_dir,
+        views = args.views,
+        workers = args.workers,
+        ext = args.format,
+        force = args.force,
+        cache_dir = args.cache_dir,
+        fps = args.fps,
+        dpi = args.dpi,
+        quality = args.quality,
+        window = window,
+        bands = bands,
+        by_group = args.by_group,
+        threshold = args.threshold
+    )
+    print('{} rendered, {} up to date, {} failed'.format(
+        len(result['rendered']), len(result['skipped']), len(result['failed'])))
+
+    return 1 if result['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
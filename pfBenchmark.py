@@ -0,0 +1,159 @@
+import os
+import argparse
+import json
+import time
+import tempfile
+import tracemalloc
+import xarray as xr
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from pfAnimate import VIEWS, precompute, build_view
+from pfLoad import open_ensemble
+from pfParallel import render_frames
+
+def synthetic_dataset(samples=50, steps=365, start='2005-10-01', freq='D', seed=0):
+
+    # ensemble with the same schema the animators expect
+    rng = np.random.default_rng(seed)
+    groups = ['MPD','NN','R']
+    t = pd.date_range(start=start, periods=steps, freq=freq)
+    shape = (len(groups), samples, steps)
+
+    ds = xr.Dataset(coords={
+        'group': groups,
+        'sample': np.arange(1, samples+1),
+        't': t
+    })
+
+    # one seasonal cycle per water year, snow in winter only
+    per_year = pd.Timedelta(days=365) / pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+    phase = 2 * np.pi * np.arange(steps) / per_year
+    cycles = {
+        'net_runoff': 300 * (1 + np.sin(phase)),
+        'soil': 400 * (1 + np.cos(phase)),
+        'et': 200 * (1 - np.cos(phase)),
+        'swe': 600 * np.clip(np.sin(phase - 0.5), 0, None)
+    }
+
+    for area in ['burned','unburned','watershed']:
+        for var, cycle in cycles.items():
+            ds[var + '_' + area] = (('group','sample','t'), cycle + rng.normal(0, 20, shape))
+            ds['norm_' + var + '_' + area] = (('group','sample','t'), rng.normal(0, 8, shape))
+
+    ds['init_soil_burned'] = (('group','sample'), rng.uniform(279, 294, shape[:2]))
+    ds['init_soil_unburned'] = (('group','sample'), rng.uniform(279, 294, shape[:2]))
+    ds['downstream_cells'] = (('group','sample'), rng.uniform(0, 300, shape[:2]))
+
+    # peak and melt-out of the ensemble mean swe
+    for area in ['burned','unburned']:
+        swe = ds['swe_' + area].mean(dim=['group','sample']).values
+        peak = int(np.argmax(swe))
+        bare = np.nonzero(swe[peak:] <= 0)[0]
+        melted = peak + int(bare[0]) if len(bare) else steps - 1
+        ds['swe_' + area].attrs['peak'] = t[peak].isoformat()
+        ds['swe_' + area].attrs['melted'] = t[melted].isoformat()
+
+    return ds
+
+def render(ds, view, frames):
+
+    # build a view and draw the given frames, timing each one
+    start = time.perf_counter()
+    state = precompute(ds, [view])
+    fig, update = build_view(view, state)
+    setup = time.perf_counter() - start
+
+    latency = []
+    for frame in frames:
+        tick = time.perf_counter()
+        update(frame)
+        fig.canvas.draw()
+        latency.append(time.perf_counter() - tick)
+
+    total = time.perf_counter() - start
+    plt.close(fig)
+
+    return setup, total, latency
+
+def benchmark(view, samples=50, steps=365, frames=None):
+
+    ds = synthetic_dataset(samples=samples, steps=steps)
+    frames = range(steps if frames is None else min(frames, steps))
+
+    # tracing slows drawing badly, so time and trace in separate passes
+    setup, total, latency = render(ds, view, frames)
+
+    # memory per frame is bounded, so a few traced frames find the peak
+    tracemalloc.start()
+    render(ds, view, frames[:3])
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latency = np.array(latency) * 1000
+    return {
+        'view': view,
+        'samples': samples,
+        'steps': steps,
+        'frames': len(latency),
+        'setup_s': setup,
+        'total_s': total,
+        'frame_mean_ms': float(latency.mean()),
+        'frame_p50_ms': float(np.percentile(latency, 50)),
+        'frame_p95_ms': float(np.percentile(latency, 95)),
+        'frame_max_ms': float(latency.max()),
+        'peak_mb': peak / 2**20
+    }
+
+def lazy_parallel_check(view='burned', samples=4, steps=20, workers=2):
+
+    # the process pool fed from a dataset opened lazily off disk, the way
+    # real runs arrive; a dask pool inherited across fork used to hang here
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'ensemble.nc')
+        synthetic_dataset(samples=samples, steps=steps).to_netcdf(path)
+        ds = open_ensemble(path)
+        try:
+            paths = render_frames(ds, view, os.path.join(tmp, 'frames'), workers=workers)
+        finally:
+            ds.close()
+
+    if len(paths) != steps:
+        raise RuntimeError('rendered %d of %d frames from a lazy dataset' % (len(paths), steps))
+
+    return len(paths)
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Benchmark the animation pipeline on synthetic ensembles.')
+    parser.add_argument('--views', nargs='+', default=['burned','unburned','watershed'], choices=list(VIEWS))
+    parser.add_argument('--samples', nargs='+', type=int, default=[10,100,1000])
+    parser.add_argument('--steps', nargs='+', type=int, default=[365])
+    parser.add_argument('--frames', type=int, default=None, help='only time the first N frames')
+    parser.add_argument('--json', default=None, help='write results to this file')
+    parser.add_argument('--check-lazy', action='store_true', help='only check parallel rendering of a lazily opened dataset')
+    args = parser.parse_args()
+
+    if args.check_lazy:
+        print('lazy parallel render ok:', lazy_parallel_check(), 'frames')
+        return
+
+    results = []
+    print('{:<10} {:>8} {:>7} {:>7} {:>9} {:>9} {:>9} {:>9} {:>9}'.format(
+        'view', 'samples', 'steps', 'frames', 'setup s', 'total s', 'mean ms', 'p95 ms', 'peak MB'))
+    for view in args.views:
+        for samples in args.samples:
+            for steps in args.steps:
+                r = benchmark(view, samples=samples, steps=steps, frames=args.frames)
+                results.append(r)
+                print('{view:<10} {samples:>8} {steps:>7} {frames:>7} {setup_s:>9.2f} {total_s:>9.2f} '
+                      '{frame_mean_ms:>9.1f} {frame_p95_ms:>9.1f} {peak_mb:>9.1f}'.format(**r))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
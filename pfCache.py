@@ -0,0 +1,107 @@
+import os
+import uuid
+import shutil
+import hashlib
+import numpy as np
+import matplotlib
+import matplotlib.image as mpimg
+from pfAnimate import VIEWS
+from pfPanels import field_key
+
+def view_digest(state, view, window=None, dpi=None):
+
+    # everything the frames of a view share: layout, render settings and series
+    spec = VIEWS[view]
+    digest = hashlib.sha256()
+    digest.update(repr(spec).encode())
+    digest.update(repr((state['quality'], state['bands'], state['groups'], window, dpi, matplotlib.__version__)).encode())
+    digest.update(np.ascontiguousarray(state['x']).tobytes())
+
+    for panel in spec['panels']:
+        for var, alpha in panel.get('background', []):
+            digest.update(np.ascontiguousarray(state['means'][var]).tobytes())
+        for layer in panel.get('progress', []):
+            digest.update(np.ascontiguousarray(state['means'][layer['var']]).tobytes())
+            for low, high in state['bands']:
+                for q in (low, high):
+                    digest.update(np.ascontiguousarray(state['quantiles'][layer['var']][q]).tobytes())
+            if state['groups']:
+                digest.update(np.ascontiguousarray(state['group_means'][layer['var']]).tobytes())
+        for marker in panel.get('markers', []):
+            date, loc, reached = state['markers'][marker['var']][marker['event']]
+            digest.update(str(date).encode())
+        if panel['kind'] == 'map':
+            field = state['fields'][field_key(panel)]
+            if field['static']:
+                digest.update(np.ascontiguousarray(field['load'](0)).tobytes())
+
+    return digest.hexdigest()
+
+def frame_keys(state, view, window=None, dpi=None):
+
+    # a frame's key adds its position, the scatter points and any moving map
+    base = view_digest(state, view, window, dpi)
+    points = state['points']
+    layers = [
+        (panel['x'], layer['y'], layer.get('group'))
+        for panel in VIEWS[view]['panels']
+        for layer in panel.get('layers', [])
+    ]
+    fields = [
+        state['fields'][field_key(panel)]
+        for panel in VIEWS[view]['panels']
+        if panel['kind'] == 'map'
+    ]
+    fields = [field for field in fields if not field['static']]
+
+    def key(frame):
+        digest = hashlib.sha256(base.encode())
+        digest.update(('%d %s' % (frame, state['labels'][frame])).encode())
+        for x, y, group in layers:
+            digest.update(np.ascontiguousarray(points(x, y, frame, group)).tobytes())
+        for field in fields:
+            digest.update(np.ascontiguousarray(field['load'](frame)).tobytes())
+        return digest.hexdigest()
+
+    return key
+
+def frame_cache(cache_dir, state, view, window=None, dpi=None):
+
+    # content-addressed pngs, fanned out over subdirectories by key prefix
+    key = frame_keys(state, view, window, dpi)
+
+    def lookup(frame):
+        k = key(frame)
+        path = os.path.join(cache_dir, k[:2], k + '.png')
+        return path, os.path.exists(path)
+
+    return lookup
+
+def store(source, path):
+
+    # copy in under a temporary name so readers never see a partial png
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = '%s.%s.tmp' % (path, uuid.uuid4().hex)
+    shutil.copyfile(source, tmp)
+    os.replace(tmp, path)
+
+    return path
+
+def store_rgba(rgba, path):
+
+    # same as store, for a canvas buffer that was never written to disk
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = '%s.%s.tmp' % (path, uuid.uuid4().hex)
+    mpimg.imsave(tmp, np.asarray(rgba), format='png')
+    os.replace(tmp, path)
+
+    return path
+
+def load_rgba(path):
+
+    # cached png back to the uint8 rgba layout of a canvas buffer
+    image = mpimg.imread(path)
+    if image.dtype != np.uint8:
+        image = np.round(image * 255).astype(np.uint8)
+
+    return np.ascontiguousarray(image)
@@ -0,0 +1,216 @@
+import os
+import json
+import uuid
+import hashlib
+import argparse
+import netCDF4
+import numpy as np
+import pandas as pd
+import xarray as xr
+from pfStats import snow_events
+from pfLoad import open_ensemble
+
+try:
+    import dask
+except ImportError:
+    dask = None
+
+# raw per-run output behind each derived quantity: fluxes are summed over time,
+# states kept as is or taken relative to the first step
+QUANTITIES = {
+    'net_runoff': {'source': 'runoff', 'accumulate': True},
+    'soil': {'source': 'soil', 'relative': True, 'initial': 'init_soil'},
+    'et': {'source': 'et', 'accumulate': True},
+    'swe': {'source': 'swe'}
+}
+
+# per-run values copied through unchanged
+PASSTHROUGH = ['downstream_cells']
+
+AREAS = ['burned','unburned','watershed']
+
+def open_runs(pattern, groups, samples, engine=None, t_chunk=32):
+
+    # one file per run, e.g. 'runs/{group}/{sample}.nc', stacked to (group, sample, ...)
+    # and read in slabs of t_chunk steps
+    paths = [[pattern.format(group=group, sample=sample) for sample in samples] for group in groups]
+    if dask is not None:
+        raw = xr.open_mfdataset(
+            paths,
+            combine = 'nested',
+            concat_dim = ['group','sample'],
+            engine = engine,
+            chunks = {'t': t_chunk},
+            cache = False
+        )
+    else:
+        raw = xr.concat([
+            xr.concat([xr.open_dataset(path, engine=engine, cache=False) for path in row], dim='sample')
+            for row in paths
+        ], dim='group')
+
+    return raw.assign_coords(group=list(groups), sample=list(samples))
+
+def area_weights(raw):
+
+    # (area, ..., y, x) weights turning a sum over cells into an area mean;
+    # burned is each run's fire footprint, mask the optional domain outline
+    inside = raw['mask'] > 0 if 'mask' in raw else True
+    burned = (raw['burned'] > 0) & inside
+    masks = xr.concat(
+        [burned, ~burned & inside, xr.ones_like(burned) & inside],
+        dim = pd.Index(AREAS, name='area')
+    ).astype(np.float64)
+
+    # an empty area has no mean; left as 0/0 it would turn every ensemble
+    # mean of that area into nan without a word
+    cells = masks.sum(['y','x']).compute()
+    if (cells == 0).any():
+        empty = cells.where(cells == 0, drop=True).stack(run=cells.dims)
+        raise ValueError('runs with an empty area: ' + ', '.join(
+            '%s %s/%s' % key for key in zip(*[empty[dim].values for dim in ['area','group','sample']])
+        ))
+
+    return masks / cells
+
+def derive(raw, scale=1.0):
+
+    # every quantity of every area, run and step as one lazy graph, so each
+    # raw file is read once when the store is written; scale converts raw
+    # values to depth in mm
+    weights = area_weights(raw)
+    derived = xr.Dataset(coords={'group': raw.group, 'sample': raw.sample, 't': raw.t})
+    for name, spec in QUANTITIES.items():
+
+        # cells outside the domain may be nan in raw output and carry no weight
+        series = (raw[spec['source']].fillna(0) * weights).sum(['y','x']) * scale
+        series = series.transpose('area','group','sample','t')
+        if spec.get('accumulate'):
+            series = series.cumsum('t')
+        if spec.get('relative'):
+            first = series.isel(t=0, drop=True)
+            series = series - first
+            for area in ['burned','unburned']:
+                derived[spec['initial'] + '_' + area] = first.sel(area=area, drop=True)
+
+        # each run against the ensemble mean of the same step
+        norm = series - series.mean(['group','sample'])
+        for area in AREAS:
+            derived[name + '_' + area] = series.sel(area=area, drop=True)
+            derived['norm_' + name + '_' + area] = norm.sel(area=area, drop=True)
+
+    for var in PASSTHROUGH:
+        if var in raw:
+            derived[var] = raw[var]
+
+    return derived
+
+def mark_events(path, t_chunk=32):
+
+    # swe peak and melt-out of the ensemble mean, streamed back from the
+    # written store and kept as attrs so opening skips detection
+    events = {}
+    ds = open_ensemble(path, t_chunk)
+    try:
+        for area in ['burned','unburned']:
+            var = 'swe_' + area
+            if var in ds:
+                swe = ds[var].mean(dim=['group','sample']).compute()
+                for event, loc in zip(['peak','melted'], snow_events(swe)):
+                    events.setdefault(var, {})[event] = pd.Timestamp(ds.t.values[int(loc)]).isoformat()
+    finally:
+        ds.close()
+
+    with netCDF4.Dataset(path, 'a') as nc:
+        for var, dates in events.items():
+            for event, date in dates.items():
+                nc[var].setncattr(event, date)
+
+    return events
+
+def write_store(derived, output, t_chunk=32, complevel=4):
+
+    # compressed netcdf chunked along t, written under a temporary name;
+    # dask computes and writes one block of steps at a time
+    if dask is not None:
+        derived = derived.chunk({dim: -1 if dim != 't' else t_chunk for dim in derived.dims})
+    encoding = {}
+    for var, da in derived.data_vars.items():
+        encoding[var] = {
+            'zlib': True,
+            'shuffle': True,
+            'complevel': complevel,
+            'chunksizes': [min(da.sizes[dim], t_chunk) if dim == 't' else da.sizes[dim] for dim in da.dims]
+        }
+    tmp = '%s.%s.tmp' % (output, uuid.uuid4().hex)
+    try:
+        derived.to_netcdf(tmp, encoding=encoding)
+        mark_events(tmp, t_chunk)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, output)
+
+    return output
+
+def source_digest(pattern, groups, samples, scale):
+
+    # raw files by size and modification time; hashing their contents
+    # would cost as much as the derivation it is meant to skip
+    digest = hashlib.sha256()
+    digest.update(json.dumps([QUANTITIES, PASSTHROUGH, scale], sort_keys=True).encode())
+    for group in groups:
+        for sample in samples:
+            path = pattern.format(group=group, sample=sample)
+            info = os.stat(path)
+            digest.update(('%s %d %d' % (path, info.st_size, info.st_mtime_ns)).encode())
+
+    return digest.hexdigest()
+
+def derived_ensemble(pattern, groups, samples, output, scale=1.0, t_chunk=32, force=False):
+
+    # reopen the derived store when its raw inputs are unchanged, rebuild it otherwise
+    key = source_digest(pattern, groups, samples, scale)
+    if not force and os.path.exists(output):
+        with xr.open_dataset(output) as ds:
+            current = ds.attrs.get('source_digest') == key
+        if current:
+            return open_ensemble(output)
+
+    raw = open_runs(pattern, groups, samples, t_chunk=t_chunk)
+    try:
+        derived = derive(raw, scale)
+        derived.attrs['source_digest'] = key
+        write_store(derived, output, t_chunk)
+    finally:
+        raw.close()
+
+    return open_ensemble(output)
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Derive the animation variables from raw per-run output.')
+    parser.add_argument('pattern', help='path of one run, e.g. runs/{group}/{sample}.nc')
+    parser.add_argument('output', help='netcdf store for the derived ensemble')
+    parser.add_argument('--groups', nargs='+', default=['MPD','NN','R'])
+    parser.add_argument('--samples', type=int, default=50, help='runs per group, numbered from 1')
+    parser.add_argument('--scale', type=float, default=1.0, help='factor from raw units to mm')
+    parser.add_argument('--t-chunk', type=int, default=32)
+    parser.add_argument('--force', action='store_true', help='derive even if the store is up to date')
+    args = parser.parse_args()
+
+    ds = derived_ensemble(
+        args.pattern,
+        args.groups,
+        list(range(1, args.samples + 1)),
+        args.output,
+        scale = args.scale,
+        t_chunk = args.t_chunk,
+        force = args.force
+    )
+    print(ds)
+    ds.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import numpy as np
+from pfAnimate import VIEWS, window_steps
+from pfPanels import field_key
+
+def frame_changes(state, view, frames, window=None):
+
+    # visible change from each frame to the next, as a fraction of its panel
+    frames = np.asarray(frames)
+    change = np.zeros(len(frames))
+    arrays = state['arrays']
+    pairs = {}
+
+    for panel in VIEWS[view]['panels']:
+
+        # progress fills: share of the panel's total area newly revealed
+        for layer in panel.get('progress', []):
+            area = np.concatenate([[0], np.cumsum(np.abs(np.nan_to_num(state['means'][layer['var']])))])
+            revealed = np.diff(area[frames]) / (area[-1] or 1)
+            change[1:] = np.maximum(change[1:], revealed)
+
+        # markers: a recolor always has to be shown
+        for marker in panel.get('markers', []):
+            reached = state['markers'][marker['var']][marker['event']][2][frames]
+            change[1:][reached[1:] != reached[:-1]] = np.inf
+
+        # maps with a time axis are not scanned ahead, so every frame is kept
+        if panel['kind'] == 'map' and not state['fields'][field_key(panel)]['static']:
+            change[1:] = np.inf
+
+        # scatter points: largest move relative to the panel's y range
+        for layer in panel.get('layers', []):
+            pairs[(panel['x'], layer['y'])] = panel['ylim'][1] - panel['ylim'][0]
+
+    # a scrolling window moves every series panel by its share of the window
+    if window:
+        steps = np.diff(frames) / window
+        change[1:] = np.maximum(change[1:], np.where(frames[1:] > window, steps, 0))
+
+    # lazily read scatter data is not scanned ahead of time
+    if arrays is not None:
+        for pair, span in pairs.items():
+            block = arrays[pair][frames].reshape(len(frames), -1)
+            moved = np.nan_to_num(np.abs(np.diff(block, axis=0))).max(axis=1) / span
+            change[1:] = np.maximum(change[1:], moved)
+
+    return change
+
+def keyframes(state, view, frames=None, threshold=0.02, max_stride=10, window=None):
+
+    # keep a frame once the change accumulated since the last kept one is visible
+    if frames is None:
+        frames = np.arange(len(state['dates']))
+    frames = np.asarray(frames)
+    change = frame_changes(state, view, frames, window_steps(window, state['dates']))
+
+    keys = [0]
+    accumulated = 0
+    for i in range(1, len(frames)):
+        accumulated += change[i]
+        if accumulated >= threshold or i - keys[-1] >= max_stride or i == len(frames) - 1:
+            keys.append(i)
+            accumulated = 0
+
+    # each kept frame is held for every original frame it stands in for
+    keys = np.array(keys)
+    holds = np.diff(np.append(keys, len(frames)))
+
+    return frames[keys], holds
@@ -0,0 +1,149 @@
+import queue
+import threading
+import xarray as xr
+import numpy as np
+from pfReduce import stream_stats
+
+try:
+    import dask
+except ImportError:
+    dask = None
+
+def open_ensemble(path, t_chunk=1, engine=None):
+
+    # open lazily; nothing is read until a reduction or a frame asks for it
+    if dask is not None:
+        chunks = {'t': t_chunk}
+    else:
+        chunks = None
+
+    return xr.open_dataset(
+        path,
+        engine = engine,
+        chunks = chunks,
+        cache = False
+    )
+
+def frame_loader(ds, variables):
+
+    # read every variable one frame needs as a single timestep hyperslab;
+    # the lock keeps a prefetch thread and the drawing thread from crossing
+    last = {}
+    lock = threading.Lock()
+
+    def load(frame):
+        with lock:
+            if last.get('frame') != frame:
+                sub = ds[variables]
+                if 't' in sub.dims:
+                    sub = sub.isel(t=frame)
+                last['ds'] = sub.load()
+                last['frame'] = frame
+            return last['ds']
+
+    return load
+
+def scatter_points(sub, x, y, group=None):
+
+    # flatten one timestep (and optionally one group) to an (n,2) array
+    if group is not None:
+        sub = sub.sel(group=group)
+    xv, yv = xr.broadcast(sub[x], sub[y])
+
+    return np.column_stack([
+        xv.values.ravel(),
+        yv.values.ravel()
+    ])
+
+def lazy_points(ds, variables):
+
+    # scatter data read from disk one timestep at a time
+    load = frame_loader(ds, variables)
+
+    def points(x, y, frame, group=None):
+        return scatter_points(load(frame), x, y, group)
+
+    return points
+
+def in_memory(ds, variables):
+
+    # dask-backed or backend-lazy variables must not be densified
+    return all(ds[var].variable._in_memory for var in variables)
+
+def field_loader(da, select=None, reduce='mean', max_cells=None):
+
+    # read one (y, x) slice per frame, streaming a statistic over the ensemble dims left
+    static = 't' not in da.dims
+    if select:
+        da = da.sel(**select)
+
+    # thin large grids on read so no more cells are fetched than can be shown
+    stride = 1
+    if max_cells:
+        stride = max(1, -(-max(da.sizes['y'], da.sizes['x']) // max_cells))
+    da = da.isel(y=slice(None, None, stride), x=slice(None, None, stride))
+    last = {}
+    lock = threading.Lock()
+
+    def load(frame):
+        key = None if static else frame
+        with lock:
+            if 'field' not in last or last['frame'] != key:
+                sub = da if static else da.isel(t=frame)
+                extra = [dim for dim in sub.dims if dim not in ('y','x')]
+                if extra:
+                    sub = stream_stats(sub, extra)[reduce]
+                last['field'] = sub.transpose('y','x').values
+                last['frame'] = key
+            return last['field']
+
+    return {
+        'load': load,
+        'static': static,
+        'x': da.x.values,
+        'y': da.y.values
+    }
+
+def prefetched(extract, frames, depth=4):
+
+    # extract upcoming frames on a background thread while the caller draws;
+    # at most depth frames wait in the queue, depth 0 extracts inline
+    if depth < 1:
+        for frame in frames:
+            yield frame, extract(frame)
+        return
+
+    ready = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def offer(item):
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for frame in frames:
+                if not offer((frame, extract(frame))):
+                    return
+        except Exception as e:
+            offer((done, e))
+            return
+        offer((done, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            frame, data = ready.get()
+            if frame is done:
+                if data is not None:
+                    raise data
+                return
+            yield frame, data
+    finally:
+        stop.set()
@@ -0,0 +1,382 @@
+import numpy as np
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from matplotlib.patches import Rectangle
+from matplotlib.transforms import blended_transform_factory
+from pfProfile import NO_PROFILE
+
+# per-group mean lines, styled to echo the scatter markers' group order
+GROUP_LINESTYLES = {'MPD': '-', 'NN': '--', 'R': ':'}
+
+def date_numbers(t):
+
+    # convert datetimes to the float axis units used by artist vertices
+    return np.asarray(mdates.date2num(t))
+
+def progress_clip(ax, x):
+
+    # full-height strip in data x / axes y, widened each frame to reveal a fill
+    return Rectangle(
+        (x[0], 0), 0, 1,
+        transform = blended_transform_factory(ax.transData, ax.transAxes)
+    )
+
+def progress_width(x, frame, start=0):
+
+    # the fill over t[:frame] ends at the last drawn step
+    if frame < 1:
+        return 0
+    return max(x[frame-1] - x[start], 0)
+
+def window_span(n, lo, window):
+
+    # two windows of data from the block the view starts in, so any trailing
+    # window fits and the span only moves once every window steps
+    if not window:
+        return slice(0, n)
+    start = lo // window * window
+    return slice(start, min(start + 2 * window + 1, n))
+
+def fill_outline(x, y1, y2):
+
+    # the closed polygon fill_between draws: along y2, then back along y1
+    return np.concatenate([
+        np.column_stack([x, y2]),
+        np.column_stack([x[::-1], y1[::-1]])
+    ])
+
+def window_range(n, frame, window):
+
+    # trailing window ending at the frame, pinned to the start of the run
+    hi = min(max(frame, window), n - 1)
+    return max(hi - window, 0), hi
+
+def hide_frame(ax, bottom=False):
+
+    # strip spines and ticks from a time series panel
+    if not bottom:
+        plt.setp(ax.get_xticklabels(), visible=False)
+    plt.setp(ax.get_yticklabels(), visible=False)
+    ax.spines['top'].set_visible(False)
+    ax.spines['bottom'].set_visible(False)
+    ax.spines['left'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.tick_params(top = False)
+    ax.tick_params(bottom = bottom)
+    ax.tick_params(left = False)
+    ax.tick_params(right = False)
+
+##########################
+### TIME SERIES PANELS ###
+##########################
+
+def series_panel(ax, panel, state, profile=NO_PROFILE):
+
+    means = state['means']
+    t = state['t']
+    x = state['x']
+    rasterized = state['quality']['rasterized']
+
+    # windowed panels draw each series over a short span only, moved along
+    # with the view; one artist per series, so no fills meet along a seam.
+    # artists start out over the whole run so autoscaling and the frozen
+    # layout see all of it
+    window = panel.get('window')
+    span = slice(0, len(x))
+    zero = np.zeros(len(x))
+    movers = []
+
+    # add full-length background series
+    for var, alpha in panel.get('background', []):
+        background = ax.fill_between(
+            x = t[span],
+            y1 = 0,
+            y2 = means[var][span],
+            color = 'silver',
+            alpha = alpha,
+            rasterized = rasterized
+        )
+        movers.append((background, zero, means[var]))
+
+    # add full progress fills once, revealed by a clip strip every frame
+    fills = []
+    for layer in panel['progress']:
+        clip = progress_clip(ax, x)
+        fill = ax.fill_between(
+            x = t[span],
+            y1 = 0,
+            y2 = means[layer['var']][span],
+            color = layer['color'],
+            alpha = layer['alpha'],
+            label = layer.get('label'),
+            rasterized = rasterized
+        )
+        fill.set_clip_path(clip)
+        fills.append((clip, fill))
+        movers.append((fill, zero, means[layer['var']]))
+
+        # ensemble percentile bands, nested and fainter, revealed by the same strip
+        for low, high in state['bands']:
+            band = ax.fill_between(
+                x = t[span],
+                y1 = state['quantiles'][layer['var']][low][span],
+                y2 = state['quantiles'][layer['var']][high][span],
+                color = layer['color'],
+                alpha = layer['alpha'] * 0.3,
+                linewidth = 0,
+                rasterized = rasterized
+            )
+            band.set_clip_path(clip)
+            fills.append((clip, band))
+            movers.append((band, state['quantiles'][layer['var']][low], state['quantiles'][layer['var']][high]))
+
+        # one mean line per sampling group over the ensemble fill
+        for g, group in enumerate(state['groups']):
+            line, = ax.plot(
+                t[span],
+                state['group_means'][layer['var']][g][span],
+                color = layer['color'],
+                linestyle = GROUP_LINESTYLES.get(group, '-'),
+                linewidth = 1,
+                rasterized = rasterized
+            )
+            line.set_clip_path(clip)
+            fills.append((clip, line))
+            movers.append((line, None, state['group_means'][layer['var']][g]))
+
+    def move(span):
+
+        # redraw every series over a new span of the run
+        for artist, y1, y2 in movers:
+            if y1 is None:
+                artist.set_data(x[span], y2[span])
+            else:
+                artist.set_verts([fill_outline(x[span], y1[span], y2[span])])
+
+    # add peak and melt markers, recolored once reached
+    markers = []
+    for marker in panel.get('markers', []):
+        date, loc, reached = state['markers'][marker['var']][marker['event']]
+        artist = ax.scatter(
+            x = date,
+            y = means[marker['var']][loc] + marker['offset'],
+            marker = marker['marker'],
+            color = 'silver',
+            alpha = marker['off_alpha']
+        )
+        markers.append((marker, reached, artist))
+
+    # housekeeping
+    if 'ylim' in panel:
+        ax.set_ylim(panel['ylim'])
+    if 'ylabel' in panel:
+        ax.set_ylabel(panel['ylabel'],rotation=0,loc='center')
+    if 'legend' in panel:
+        ax.legend(**panel['legend'])
+    hide_frame(ax, bottom=panel.get('bottom', False))
+
+    name = panel['name']
+    shown = {'span': span}
+
+    def extract(frame):
+
+        with profile.time(name, 'extract', frame):
+            lo, hi = 0, len(x) - 1
+            if window:
+                lo, hi = window_range(len(x), frame, window)
+            return lo, hi, window_span(len(x), lo, window), progress_width(x, frame, lo)
+
+    def apply(frame, data):
+
+        lo, hi, span, width = data
+
+        # scroll the window, widen the clip strips and recolor reached markers
+        with profile.time(name, 'artists'):
+            if window:
+                ax.set_xlim(x[lo], x[hi])
+                if span != shown['span']:
+                    move(span)
+                    shown['span'] = span
+            for clip, fill in fills:
+                clip.set_x(x[lo])
+                clip.set_width(width)
+                fill.set_clip_path(clip)
+                fill.set_visible(width > 0)
+            for marker, reached, artist in markers:
+                if reached[frame]:
+                    artist.set_color(marker['color'])
+                    artist.set_alpha(0.5)
+                else:
+                    artist.set_color('silver')
+                    artist.set_alpha(marker['off_alpha'])
+
+        return [fill for clip, fill in fills] + [artist for marker, reached, artist in markers]
+
+    return extract, apply
+
+######################
+### SCATTER PANELS ###
+######################
+
+def scatter_panel(ax, panel, state, profile=NO_PROFILE):
+
+    points = state['points']
+    rasterized = state['quality']['rasterized']
+
+    # add center line
+    ax.axhline(
+        0,
+        linestyle = '--',
+        linewidth = 1,
+        color = 'silver',
+        alpha = 0.5
+    )
+
+    # add one collection per layer, moved every frame
+    layers = []
+    for layer in panel['layers']:
+        artist = ax.scatter(
+            *points(panel['x'], layer['y'], 0, layer.get('group')).T,
+            color = layer['color'],
+            marker = layer['marker'],
+            alpha = layer['alpha'],
+            label = layer['label'],
+            rasterized = rasterized
+        )
+        layers.append((layer, artist))
+
+    # housekeeping
+    if 'xlim' in panel:
+        ax.set_xlim(panel['xlim'])
+    ax.set_ylim(panel['ylim'])
+    ax.set_ylabel(panel.get('ylabel', ''))
+    ax.set_xlabel(panel.get('xlabel', ''))
+    ax.set_title(panel.get('title', ''))
+    ax.spines['right'].set_visible(False)
+    ax.spines['top'].set_visible(False)
+    ax.tick_params(left = False)
+    ax.tick_params(bottom = False)
+    ax.set_xticks(panel['xticks'])
+    ax.set_yticks(panel['yticks'])
+    ax.legend(**panel['legend'])
+
+    name = panel['name']
+
+    def extract(frame):
+
+        with profile.time(name, 'extract', frame):
+            return [points(panel['x'], layer['y'], frame, layer.get('group')) for layer, artist in layers]
+
+    def apply(frame, offsets):
+
+        with profile.time(name, 'artists'):
+            for (layer, artist), xy in zip(layers, offsets):
+                artist.set_offsets(xy)
+
+        return [artist for layer, artist in layers]
+
+    return extract, apply
+
+##################
+### MAP PANELS ###
+##################
+
+def field_key(panel):
+
+    # map panels reading the same slices share one loader
+    return (
+        panel.get('path'),
+        panel['var'],
+        repr(panel.get('select')),
+        panel.get('reduce', 'mean'),
+        panel.get('max_cells')
+    )
+
+def map_panel(ax, panel, state, profile=NO_PROFILE):
+
+    field = state['fields'][field_key(panel)]
+    load = field['load']
+    x = field['x']
+    y = field['y']
+
+    # one image artist, its pixels replaced in place every frame
+    first = load(0)
+    dx = (x[-1] - x[0]) / max(len(x) - 1, 1)
+    dy = (y[-1] - y[0]) / max(len(y) - 1, 1)
+    clim = panel.get('clim', [np.nanmin(first), np.nanmax(first)])
+    image = ax.imshow(
+        first,
+        origin = 'lower',
+        extent = [x[0] - dx/2, x[-1] + dx/2, y[0] - dy/2, y[-1] + dy/2],
+        cmap = panel.get('cmap', 'viridis'),
+        vmin = clim[0],
+        vmax = clim[1],
+        interpolation = 'nearest',
+        aspect = 'equal'
+    )
+
+    # housekeeping
+    if 'colorbar' in panel:
+        ax.figure.colorbar(image, ax=ax, label=panel['colorbar'])
+    ax.set_title(panel.get('title', ''))
+    ax.set_xticks([])
+    ax.set_yticks([])
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+
+    name = panel['name']
+
+    def extract(frame):
+
+        # fields without a time axis are drawn once
+        if field['static']:
+            return None
+
+        with profile.time(name, 'extract', frame):
+            return load(frame)
+
+    def apply(frame, data):
+
+        if data is None:
+            return []
+
+        with profile.time(name, 'artists'):
+            image.set_data(data)
+
+        return [image]
+
+    return extract, apply
+
+####################
+### LABEL PANELS ###
+####################
+
+def label_panel(ax, panel, state, profile=NO_PROFILE):
+
+    # invisible axes carrying a shared axis label
+    ax.spines['top'].set_visible(False)
+    ax.spines['bottom'].set_visible(False)
+    ax.spines['left'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.tick_params(top = False)
+    ax.tick_params(bottom = False)
+    ax.tick_params(left = False)
+    ax.tick_params(right = False)
+    ax.set_xticks([])
+    ax.set_yticks([])
+    ax.set_xlabel(panel['xlabel'],labelpad=panel.get('labelpad'))
+
+    def extract(frame):
+        return None
+
+    def apply(frame, data):
+        return []
+
+    return extract, apply
+
+PANEL_BUILDERS = {
+    'series': series_panel,
+    'scatter': scatter_panel,
+    'map': map_panel,
+    'label': label_panel
+}
@@ -0,0 +1,149 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import multiprocessing
+import numpy as np
+import matplotlib
+from concurrent.futures import ProcessPoolExecutor
+from pfAnimate import precompute, build_panels
+from pfStream import keyed, render_png, write_concat, clear_frames
+from pfCache import frame_cache
+from pfKeyframes import keyframes
+from pfLoad import prefetched
+from pfProfile import Profile, NO_PROFILE
+
+try:
+    import dask
+except ImportError:
+    dask = None
+
+# per-process figure, built once by the pool initializer
+_worker = {}
+
+def _init_worker(view, state, dpi, window, cache_dir, prefetch, profiled):
+
+    # headless workers each own an Agg figure built by the shared layout code
+    matplotlib.use('Agg')
+
+    # a forked child inherits the parent's dask thread pool without its
+    # threads, so lazy reads in the worker must run on the calling thread
+    if dask is not None:
+        dask.config.set(scheduler='synchronous')
+    profile = Profile() if profiled else NO_PROFILE
+    fig, axes, extract, apply = build_panels(view, state, window=window, profile=profile)
+    if dpi:
+        fig.set_dpi(dpi)
+    _worker['fig'] = fig
+    _worker['extract'] = keyed(extract, frame_cache(cache_dir, state, view, window, dpi) if cache_dir else None, profile)
+    _worker['apply'] = apply
+    _worker['prefetch'] = prefetch
+    _worker['profile'] = profile
+
+def _render_chunk(chunk):
+
+    # draw a contiguous run of frames to numbered pngs, extracting ahead
+    profile = _worker['profile']
+    apply = _worker['apply']
+    frames = [frame for frame, path in chunk]
+    paths = []
+    for (frame, (data, cached)), path in zip(prefetched(_worker['extract'], frames, _worker['prefetch']), [path for frame, path in chunk]):
+        paths.append(render_png(_worker['fig'], lambda frame: apply(frame, data), frame, path, cached, profile))
+
+    # hand this chunk's timings back to the parent
+    rows = []
+    if profile is not NO_PROFILE:
+        rows, profile.rows = profile.rows, []
+
+    return paths, rows
+
+def render_frames(ds, view, frames_dir, frames=None, workers=None, dpi=None, threshold=None, max_stride=10, fps=10, quality='final', window=None, bands=None, by_group=False, cache_dir=None, prefetch=4, profile=NO_PROFILE):
+
+    # reduce once in the parent; forked workers inherit the state
+    state = precompute(ds, [view], quality, bands, by_group)
+    stride = 1
+    if frames is None:
+        stride = state['quality']['frame_stride']
+        frames = range(0, len(state['dates']), stride)
+    workers = workers or os.cpu_count()
+    os.makedirs(frames_dir, exist_ok=True)
+    clear_frames(frames_dir)
+
+    # adaptive mode: render only visibly changed frames, held via a concat
+    # list; a preview stride holds each frame as long as the steps it skips
+    if threshold is not None:
+        frames, holds = keyframes(state, view, frames, threshold=threshold, max_stride=max_stride, window=window)
+        write_concat(frames_dir, [hold * stride for hold in holds], fps)
+    elif stride > 1:
+        write_concat(frames_dir, [stride] * len(frames), fps)
+    frames = list(frames)
+
+    # name files by output position so any frame subset stays sequential
+    jobs = [
+        (frame, os.path.join(frames_dir, 'frame_%05d.png' % index))
+        for index, frame in enumerate(frames)
+    ]
+
+    # several contiguous chunks per worker keeps the pool balanced
+    chunks = [
+        [jobs[i] for i in chunk]
+        for chunk in np.array_split(np.arange(len(jobs)), workers * 4)
+        if len(chunk)
+    ]
+
+    paths = []
+    with ProcessPoolExecutor(
+        max_workers = workers,
+        mp_context = multiprocessing.get_context('fork'),
+        initializer = _init_worker,
+        initargs = (view, state, dpi, window, cache_dir, prefetch, profile is not NO_PROFILE)
+    ) as pool:
+        for chunk_paths, rows in pool.map(_render_chunk, chunks):
+            paths += chunk_paths
+            if rows:
+                profile.extend(rows)
+
+    return paths
+
+def assemble(frames_dir, output, fps=10):
+
+    # encode numbered pngs with the ffmpeg matplotlib is configured to use
+    cmd = [
+        matplotlib.rcParams['animation.ffmpeg_path'],
+        '-y',
+        '-loglevel', 'error'
+    ]
+
+    # held keyframes come with a concat list, resampled back to a steady rate
+    concat = os.path.join(frames_dir, 'frames.txt')
+    if os.path.exists(concat):
+        cmd += ['-f', 'concat', '-safe', '0', '-i', concat]
+        filters = ['fps=%g' % fps]
+    else:
+        cmd += ['-framerate', str(fps), '-i', os.path.join(frames_dir, 'frame_%05d.png')]
+        filters = []
+
+    if not output.endswith('.gif'):
+        filters.append('pad=ceil(iw/2)*2:ceil(ih/2)*2')
+        cmd += ['-pix_fmt', 'yuv420p']
+    if filters:
+        cmd += ['-vf', ','.join(filters)]
+    subprocess.run(cmd + [output], check=True)
+
+    return output
+
+def render_parallel(ds, view, output, frames=None, workers=None, fps=10, dpi=None, frames_dir=None, threshold=None, max_stride=10, quality='final', window=None, bands=None, by_group=False, cache_dir=None, prefetch=4, profile=NO_PROFILE):
+
+    # render into a scratch directory unless the pngs should be kept
+    keep = frames_dir is not None
+    if not keep:
+        frames_dir = tempfile.mkdtemp(prefix='pf_frames_')
+
+    try:
+        render_frames(ds, view, frames_dir, frames=frames, workers=workers, dpi=dpi, threshold=threshold, max_stride=max_stride, fps=fps, quality=quality, window=window, bands=bands, by_group=by_group, cache_dir=cache_dir, prefetch=prefetch, profile=profile)
+        assemble(frames_dir, output, fps=fps)
+    finally:
+        if not keep:
+            shutil.rmtree(frames_dir, ignore_errors=True)
+
+    return output
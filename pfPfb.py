@@ -0,0 +1,197 @@
+import os
+import re
+import glob
+import numpy as np
+import xarray as xr
+from concurrent.futures import ThreadPoolExecutor
+from xarray.backends import BackendArray
+from xarray.core import indexing
+
+try:
+    import dask
+except ImportError:
+    dask = None
+
+### PFB LAYOUT ###
+
+# big-endian throughout: origin, cell counts, spacing and the number of
+# subgrids, then per subgrid its offset, size and refinement followed by
+# its cells as doubles with x varying fastest
+HEADER = np.dtype([
+    ('origin', '>f8', 3),
+    ('shape', '>i4', 3),
+    ('spacing', '>f8', 3),
+    ('subgrids', '>i4')
+])
+SUBGRID = np.dtype([
+    ('start', '>i4', 3),
+    ('shape', '>i4', 3),
+    ('refinement', '>i4', 3)
+])
+
+def pfb_index(path):
+
+    # walk the subgrid headers once; files written by the same run with the
+    # same process topology share this index
+    raw = np.memmap(path, dtype=np.uint8, mode='r')
+    header = np.frombuffer(raw, HEADER, 1)[0]
+    offset = HEADER.itemsize
+    subgrids = []
+    for i in range(int(header['subgrids'])):
+        sub = np.frombuffer(raw, SUBGRID, 1, offset)[0]
+        offset += SUBGRID.itemsize
+
+        # (x, y, z) in the file, (z, y, x) in memory
+        start = tuple(int(v) for v in sub['start'][::-1])
+        shape = tuple(int(v) for v in sub['shape'][::-1])
+        subgrids.append((offset, start, shape))
+        offset += 8 * int(np.prod(shape))
+
+    if offset != len(raw):
+        raise ValueError('%s: subgrids end at byte %d of %d' % (path, offset, len(raw)))
+
+    return {
+        'origin': tuple(float(v) for v in header['origin'][::-1]),
+        'shape': tuple(int(v) for v in header['shape'][::-1]),
+        'spacing': tuple(float(v) for v in header['spacing'][::-1]),
+        'subgrids': subgrids,
+        'size': offset,
+        'layout': layout_bytes(raw, subgrids)
+    }
+
+def layout_bytes(raw, subgrids):
+
+    # the file header and every subgrid header, read at the offsets an index
+    # expects; equal bytes mean the same decomposition, since each header
+    # fixes where the next one starts
+    starts = np.array([offset - SUBGRID.itemsize for offset, start, shape in subgrids], dtype=np.int64)
+    return np.concatenate([
+        np.asarray(raw[:HEADER.itemsize]),
+        np.asarray(raw[starts[:, None] + np.arange(SUBGRID.itemsize)]).ravel()
+    ]).tobytes()
+
+def contiguous(positions):
+
+    # runs of consecutive positions index as slices, which copy much faster
+    if len(positions) and np.all(np.diff(positions) == 1):
+        return slice(int(positions[0]), int(positions[-1]) + 1)
+
+    return positions
+
+def read_pfb(path, index, key=(slice(None),) * 3, threads=1):
+
+    # copy only the subgrids that overlap the requested (z, y, x) cells
+    # straight from the memory map; subgrids fill disjoint parts of the output
+    wanted = [np.arange(n)[k] for n, k in zip(index['shape'], key)]
+    out = np.empty([np.size(w) for w in wanted])
+    raw = np.memmap(path, dtype=np.uint8, mode='r')
+
+    def copy(subgrid):
+        offset, start, shape = subgrid
+        target = []
+        source = []
+        for w, first, n in zip(wanted, start, shape):
+            w = np.atleast_1d(w)
+            inside = np.nonzero((w >= first) & (w < first + n))[0]
+            if not len(inside):
+                return
+            target.append(contiguous(inside))
+            source.append(contiguous(w[inside] - first))
+        block = np.frombuffer(raw, '>f8', int(np.prod(shape)), offset).reshape(shape)
+        if all(isinstance(s, slice) for s in target + source):
+            out[tuple(target)] = block[tuple(source)]
+        else:
+            out[np.ix_(*[np.arange(n)[t] for n, t in zip(out.shape, target)])] = \
+                block[np.ix_(*[np.arange(n)[s] for n, s in zip(shape, source)])]
+
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(copy, index['subgrids']))
+    else:
+        for subgrid in index['subgrids']:
+            copy(subgrid)
+
+    # integer keys drop their axis like any numpy index
+    return out.reshape([np.size(w) for w, k in zip(wanted, key) if not isinstance(k, (int, np.integer))])
+
+### LAZY ARRAYS ###
+
+class PfbArray(BackendArray):
+
+    # one timestep per file; nothing is read until xarray indexes into it
+    def __init__(self, paths, index, threads=1):
+        self.paths = paths
+        self.index = index
+        self.threads = threads
+        self.shape = (len(paths),) + index['shape']
+        self.dtype = np.dtype(np.float64)
+        self.indices = {}
+
+    def file_index(self, path):
+
+        # files split into the same subgrids as the first one reuse its index;
+        # a matching size alone is not enough, other splits can have it too
+        if os.path.getsize(path) == self.index['size']:
+            raw = np.memmap(path, dtype=np.uint8, mode='r')
+            if layout_bytes(raw, self.index['subgrids']) == self.index['layout']:
+                return self.index
+        if path not in self.indices:
+            self.indices[path] = pfb_index(path)
+            if self.indices[path]['shape'] != self.index['shape']:
+                raise ValueError('%s: grid differs from %s' % (path, self.paths[0]))
+        return self.indices[path]
+
+    def read(self, key):
+        steps = np.arange(len(self.paths))[key[0]]
+        if np.ndim(steps) == 0:
+            path = self.paths[steps]
+            return read_pfb(path, self.file_index(path), key[1:], self.threads)
+        return np.stack([
+            read_pfb(self.paths[step], self.file_index(self.paths[step]), key[1:], self.threads)
+            for step in steps
+        ])
+
+    def __getitem__(self, key):
+        return indexing.explicit_indexing_adapter(key, self.shape, indexing.IndexingSupport.OUTER, self.read)
+
+def pfb_paths(pattern):
+
+    # files of one variable ordered by the timestep number in their name
+    def step(path):
+        found = re.findall(r'(\d+)\.pfb$', path)
+        return int(found[0]) if found else -1
+
+    paths = sorted(glob.glob(pattern), key=lambda path: (step(path), path))
+    if not paths:
+        raise FileNotFoundError('no .pfb files match %s' % pattern)
+
+    return paths, [step(path) for path in paths]
+
+def open_pfb(patterns, times=None, threads=4, t_chunk=1):
+
+    # {name: glob} of per-timestep files to a lazy (t, z, y, x) dataset;
+    # headers are decoded once per variable and subgrids read in parallel
+    ds = xr.Dataset()
+    grid = None
+    for name, pattern in patterns.items():
+        paths, steps = pfb_paths(pattern)
+        index = pfb_index(paths[0])
+        if grid is None:
+            grid = index
+            ds = ds.assign_coords({
+                dim: origin + spacing * (np.arange(n) + 0.5)
+                for dim, origin, spacing, n in zip(['z','y','x'], index['origin'], index['spacing'], index['shape'])
+            })
+            ds = ds.assign_coords(t=steps if times is None else list(times))
+        elif index['shape'] != grid['shape']:
+            raise ValueError('%s: grid differs from the other variables' % name)
+        if len(paths) != ds.sizes['t']:
+            raise ValueError('%s: %d timesteps, expected %d' % (name, len(paths), ds.sizes['t']))
+        array = indexing.LazilyIndexedArray(PfbArray(paths, index, threads))
+        ds[name] = xr.Variable(('t','z','y','x'), array)
+
+    # same chunking as open_ensemble so frames are read one timestep at a time
+    if dask is not None and t_chunk:
+        ds = ds.chunk({'t': t_chunk})
+
+    return ds
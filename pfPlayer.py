@@ -0,0 +1,213 @@
+import io
+import json
+import base64
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+import matplotlib.image as mpimg
+from matplotlib.colors import to_rgba
+from matplotlib.collections import PolyCollection
+from matplotlib.lines import Line2D
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from pfAnimate import VIEWS, precompute, build_panels
+from pfPanels import field_key
+
+# canvas renderer: static background, fills revealed from a second image,
+# markers, scatter points and the date label drawn from per-frame data
+PLAYER = '''<!doctype html>
+<html><head><meta charset="utf-8"><title>%(title)s</title></head>
+<body style="font-family:sans-serif">
+<canvas id="canvas" width="%(width)d" height="%(height)d"></canvas><br>
+<button id="play">play</button>
+<input id="frame" type="range" min="0" max="%(last)d" value="0" style="width:60%%">
+<script>
+const data = %(data)s;
+const canvas = document.getElementById('canvas'), ctx = canvas.getContext('2d');
+const slider = document.getElementById('frame'), button = document.getElementById('play');
+const decode = b64 => new Int16Array(Uint8Array.from(atob(b64), c => c.charCodeAt(0)).buffer);
+data.strips.forEach(s => s.right = decode(s.right));
+data.layers.forEach(l => l.points = decode(l.points));
+const image = src => new Promise(done => { const i = new Image(); i.onload = () => done(i); i.src = src; });
+const rgba = c => 'rgba(' + c.slice(0, 3).map(v => Math.round(v * 255)).join(',') + ',' + c[3] + ')';
+
+function mark(shape, x, y, r) {
+  ctx.beginPath();
+  if (shape === 'o') { ctx.arc(x, y, r, 0, 2 * Math.PI); ctx.fill(); }
+  else if (shape === 's') { ctx.fillRect(x - r, y - r, 2 * r, 2 * r); }
+  else if (shape === 'x') { ctx.moveTo(x - r, y - r); ctx.lineTo(x + r, y + r); ctx.moveTo(x - r, y + r); ctx.lineTo(x + r, y - r); ctx.stroke(); }
+  else { const d = shape === 'v' ? 1 : -1; ctx.moveTo(x, y + d * r); ctx.lineTo(x - r, y - d * r); ctx.lineTo(x + r, y - d * r); ctx.fill(); }
+}
+
+Promise.all([image(data.base), image(data.reveal)]).then(([base, reveal]) => {
+  function draw(frame) {
+    ctx.drawImage(base, 0, 0);
+    for (const s of data.strips) {
+      const w = s.right[frame] - s.left;
+      if (w > 0) ctx.drawImage(reveal, s.left, s.top, w, s.height, s.left, s.top, w, s.height);
+    }
+    for (const m of data.markers) {
+      ctx.fillStyle = rgba(frame >= m.loc ? m.on : m.off);
+      mark(m.marker, m.x, m.y, m.r);
+    }
+    for (const l of data.layers) {
+      const n = l.count, p = l.points, offset = frame * n * 2;
+      ctx.save();
+      ctx.beginPath(); ctx.rect(...l.clip); ctx.clip();
+      ctx.fillStyle = ctx.strokeStyle = rgba(l.color);
+      ctx.lineWidth = l.linewidth;
+      for (let i = 0; i < n; i++) {
+        const x = p[offset + 2 * i], y = p[offset + 2 * i + 1];
+        if (x !== -32768) mark(l.marker, x, y, l.r);
+      }
+      ctx.restore();
+    }
+    ctx.fillStyle = 'black';
+    ctx.font = data.date.size + 'px sans-serif';
+    ctx.textBaseline = 'top';
+    ctx.fillText(data.labels[frame], data.date.x, data.date.y);
+  }
+  let timer = null;
+  slider.oninput = () => draw(+slider.value);
+  button.onclick = () => {
+    if (timer) { clearInterval(timer); timer = null; button.textContent = 'play'; return; }
+    button.textContent = 'pause';
+    timer = setInterval(() => {
+      slider.value = (+slider.value + 1) %% (+slider.max + 1);
+      draw(+slider.value);
+    }, %(interval)d);
+  };
+  draw(0);
+});
+</script>
+</body></html>
+'''
+
+def png_uri(fig):
+
+    # current canvas as an embeddable png
+    fig.canvas.draw()
+    buffer = io.BytesIO()
+    mpimg.imsave(buffer, np.asarray(fig.canvas.buffer_rgba()), format='png')
+
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+def int16_b64(values):
+
+    # pixel coordinates packed as little-endian int16, nan as -32768; far
+    # outliers are clamped so they stay off canvas instead of wrapping onto it
+    values = np.where(np.isnan(values), -32768, np.clip(np.round(values), -32767, 32767))
+
+    return base64.b64encode(values.astype('<i2').tobytes()).decode()
+
+def export_player(ds, view, output, dpi=None, quality='final', bands=None, by_group=False, fps=10):
+
+    # one html file: two background images plus compact per-frame plotting data
+    state = precompute(ds, [view], quality, bands, by_group)
+    spec = VIEWS[view]
+    for panel in spec['panels']:
+        if panel['kind'] == 'map' and not state['fields'][field_key(panel)]['static']:
+            raise ValueError('the html player only supports map panels without a time axis')
+
+    # blit layout keeps the date in one axes text and the heading static
+    fig, axes, extract, apply = build_panels(view, state, blit=True)
+    FigureCanvasAgg(fig)
+    if dpi:
+        fig.set_dpi(dpi)
+    frames = len(state['dates'])
+    last = frames - 1
+    dynamic = apply(last, extract(last))
+    fig.canvas.draw()
+    width, height = fig.canvas.get_width_height()
+    scale = fig.dpi / 72
+
+    def canvas_xy(ax, x, y):
+        xy = ax.transData.transform(np.column_stack([x, y]))
+        return xy[:, 0], height - xy[:, 1]
+
+    def canvas_box(ax):
+        box = ax.get_window_extent()
+        return [box.x0, height - box.y1, box.width, box.height]
+
+    # reveal image: only the progress fills, bands and group lines of the last frame;
+    # base image: nothing that changes between frames
+    for artist in dynamic:
+        artist.set_visible(isinstance(artist, (PolyCollection, Line2D)))
+    reveal = png_uri(fig)
+    for artist in dynamic:
+        artist.set_visible(False)
+    base = png_uri(fig)
+
+    strips = []
+    markers = []
+    layers = []
+    steps = np.arange(frames)
+    size = matplotlib.rcParams['lines.markersize'] / 2 * scale
+    for ax, panel in zip(axes, spec['panels']):
+
+        # fill reveal: strip from the first step to the last drawn one
+        if panel['kind'] == 'series':
+            left, top, w, h = canvas_box(ax)
+            x0, y0 = canvas_xy(ax, state['x'][:1], [0])
+            right = canvas_xy(ax, state['x'][np.maximum(steps - 1, 0)], np.zeros(frames))[0]
+            right[0] = x0[0]
+            strips.append({
+                'left': int(np.round(x0[0])),
+                'top': int(np.floor(top)),
+                'height': int(np.ceil(h)) + 1,
+                'right': int16_b64(right)
+            })
+            for marker in panel.get('markers', []):
+                date, loc, reached = state['markers'][marker['var']][marker['event']]
+                mx, my = canvas_xy(ax, [state['x'][loc]], [state['means'][marker['var']][loc] + marker['offset']])
+                markers.append({
+                    'x': float(mx[0]),
+                    'y': float(my[0]),
+                    'r': size,
+                    'marker': marker['marker'],
+                    'loc': int(loc),
+                    'on': to_rgba(marker['color'], 0.5),
+                    'off': to_rgba('silver', marker['off_alpha'])
+                })
+
+        # scatter layers: every frame's points in canvas pixels
+        if panel['kind'] == 'scatter':
+            for layer in panel['layers']:
+                xy = np.stack([
+                    np.column_stack(canvas_xy(ax, *state['points'](panel['x'], layer['y'], frame, layer.get('group')).T))
+                    for frame in range(frames)
+                ])
+                layers.append({
+                    'count': xy.shape[1],
+                    'points': int16_b64(xy),
+                    'clip': canvas_box(ax),
+                    'marker': layer['marker'],
+                    'r': size,
+                    'linewidth': matplotlib.rcParams['lines.linewidth'] * scale,
+                    'color': to_rgba(layer['color'], layer['alpha'])
+                })
+
+    # date label where the blit layout puts it
+    date_ax = axes[spec['date_panel']]
+    dx, dy = date_ax.transAxes.transform((0, 1))
+    data = {
+        'base': base,
+        'reveal': reveal,
+        'strips': strips,
+        'markers': markers,
+        'layers': layers,
+        'labels': list(state['labels']),
+        'date': {'x': dx, 'y': height - dy, 'size': matplotlib.rcParams['font.size'] * scale}
+    }
+    plt.close(fig)
+
+    with open(output, 'w') as f:
+        f.write(PLAYER % {
+            'title': spec['heading'] or view,
+            'width': width,
+            'height': height,
+            'last': last,
+            'interval': 1000 // fps,
+            'data': json.dumps(data, separators=(',', ':'))
+        })
+
+    return output
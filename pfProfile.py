@@ -0,0 +1,75 @@
+import csv
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+class NullProfile:
+
+    # stand-in used when nothing is being recorded
+    frame = None
+    _null = nullcontext()
+
+    def time(self, panel, phase, frame=None):
+        return self._null
+
+NO_PROFILE = NullProfile()
+
+class Profile:
+
+    # per-frame, per-panel, per-phase wall clock timings
+    def __init__(self):
+        self.frame = None
+        self.rows = []
+
+    @contextmanager
+    def time(self, panel, phase, frame=None):
+
+        # work done ahead of the current frame passes its own frame number
+        if frame is None:
+            frame = self.frame
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.rows.append((frame, panel, phase, time.perf_counter() - start))
+
+    def extend(self, rows):
+
+        # merge timings recorded elsewhere, e.g. in worker processes
+        self.rows += [tuple(row) for row in rows]
+
+    def summary(self):
+
+        # totals per panel and phase across all frames
+        stats = {}
+        for frame, panel, phase, seconds in self.rows:
+            s = stats.setdefault((panel, phase), {'panel': panel, 'phase': phase, 'count': 0, 'total_s': 0.0, 'max_s': 0.0})
+            s['count'] += 1
+            s['total_s'] += seconds
+            s['max_s'] = max(s['max_s'], seconds)
+        for s in stats.values():
+            s['mean_s'] = s['total_s'] / s['count']
+
+        return sorted(stats.values(), key=lambda s: -s['total_s'])
+
+    def to_json(self, path):
+
+        with open(path, 'w') as f:
+            json.dump({
+                'summary': self.summary(),
+                'rows': [
+                    {'frame': frame, 'panel': panel, 'phase': phase, 'seconds': seconds}
+                    for frame, panel, phase, seconds in self.rows
+                ]
+            }, f, indent=2)
+
+        return path
+
+    def to_csv(self, path):
+
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'panel', 'phase', 'seconds'])
+            writer.writerows(self.rows)
+
+        return path
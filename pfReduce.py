@@ -0,0 +1,252 @@
+import argparse
+import numpy as np
+import xarray as xr
+from concurrent.futures import ThreadPoolExecutor
+
+def block_stats(block):
+
+    # count, mean, sum of squared deviations and extremes over axis 0, skipping nans
+    valid = ~np.isnan(block)
+    count = valid.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(valid, block, 0).sum(axis=0) / count
+    mean = np.nan_to_num(mean)
+
+    return {
+        'count': count,
+        'mean': mean,
+        'm2': (np.where(valid, block - mean, 0)**2).sum(axis=0),
+        'min': np.where(valid, block, np.inf).min(axis=0),
+        'max': np.where(valid, block, -np.inf).max(axis=0)
+    }
+
+def merge_stats(a, b):
+
+    # pairwise update of Chan et al., stable whatever the block order
+    if a is None:
+        return b
+    count = a['count'] + b['count']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weight = np.where(count > 0, b['count'] / count, 0)
+    delta = b['mean'] - a['mean']
+
+    return {
+        'count': count,
+        'mean': a['mean'] + delta * weight,
+        'm2': a['m2'] + b['m2'] + delta**2 * a['count'] * weight,
+        'min': np.minimum(a['min'], b['min']),
+        'max': np.maximum(a['max'], b['max'])
+    }
+
+def member_blocks(da, dims, kept, run, sel=None):
+
+    # (run, *kept) blocks stepping through the last reduced dim, one index of the others at a time
+    sel = dict(sel or {})
+    outer = dims[:-1]
+    inner = dims[-1]
+    for index in np.ndindex(*[da.sizes[dim] for dim in outer]):
+        sel.update(zip(outer, index))
+        for i in range(0, da.sizes[inner], run):
+            sel[inner] = slice(i, i + run)
+            yield da.isel(sel).transpose(inner, *kept).values.astype(np.float64)
+
+def stream_stats(da, dims=('group','sample'), by_group=False, max_bytes=2**28, threads=1, ddof=0):
+
+    # reduce over dims reading bounded blocks; working memory stays near
+    # max_bytes on top of the returned statistics themselves
+    dims = [dim for dim in dims if dim in da.dims and not (by_group and dim == 'group')]
+    if not dims:
+        raise ValueError('nothing to reduce: none of the dims are in the array')
+    kept = [dim for dim in da.dims if dim not in dims]
+    sizes = da.sizes
+
+    # split the output into tiles along its longest dim; each thread owns one
+    # tile's five accumulators plus one block and its temporaries (~4 copies)
+    budget = max_bytes // threads
+    tile_dim = max(kept, key=sizes.get) if kept else None
+    row = int(np.prod([sizes[dim] for dim in kept if dim != tile_dim])) * 8
+    length = sizes[tile_dim] if tile_dim else 1
+    length = int(min(length, max(budget // (9 * row), 1)))
+    tile = row * length
+    run = int(max((budget - 5 * tile) // (4 * tile), 1))
+
+    def tile_stats(start):
+        sel = {tile_dim: slice(start, start + length)} if tile_dim else {}
+        acc = None
+        for block in member_blocks(da, dims, kept, run, sel):
+            acc = merge_stats(acc, block_stats(block))
+        return start, acc
+
+    # assemble tiles into full output arrays
+    shape = [sizes[dim] for dim in kept]
+    stats = {name: np.empty(shape) for name in ['count','mean','m2','min','max']}
+    axis = kept.index(tile_dim) if tile_dim else None
+    starts = range(0, sizes[tile_dim], length) if tile_dim else [0]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for start, acc in pool.map(tile_stats, starts):
+            where = tuple(
+                slice(start, start + length) if i == axis else slice(None)
+                for i in range(len(kept))
+            )
+            for name in stats:
+                stats[name][where] = acc[name]
+
+    # cells with no valid members come back as nan; np.where rather than
+    # masked assignment, since reducing every dim leaves 0-d results
+    count = stats['count']
+    empty = count == 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var = np.where(count > ddof, stats['m2'] / (count - ddof), np.nan)
+    for name in ['mean','min','max']:
+        stats[name] = np.where(empty, np.nan, stats[name])
+
+    coords = {dim: da[dim] for dim in kept if dim in da.coords}
+    return xr.Dataset({
+        'mean': (kept, stats['mean']),
+        'var': (kept, var),
+        'std': (kept, np.sqrt(var)),
+        'min': (kept, stats['min']),
+        'max': (kept, stats['max']),
+        'count': (kept, count.astype(np.int64))
+    }, coords=coords)
+
+def bin_counts(block, low, width, bins, clip=False):
+
+    # per cell histogram of a (members, cells) block over bins of the given
+    # width from low, plus the members falling below low; clip folds the
+    # extremes into the outer bins, otherwise values beyond them are dropped
+    cells = len(low)
+    valid = ~np.isnan(block)
+    with np.errstate(invalid='ignore'):
+        index = np.floor((block - low) / width)
+    below = ((index < 0) & valid).sum(axis=0)
+    if clip:
+        index = np.clip(index, 0, bins - 1)
+    inside = valid & (index >= 0) & (index < bins)
+    flat = index[inside].astype(np.int64) + (np.arange(cells) * bins)[np.nonzero(inside)[1]]
+
+    return np.bincount(flat, minlength=cells * bins).reshape(cells, bins), below
+
+def crossing(counts, before, target):
+
+    # bin where the cumulative count reaches the target rank, with the
+    # count below that bin and inside it
+    cdf = before[:, None] + np.cumsum(counts, axis=1)
+    b = np.minimum((cdf < target[:, None]).sum(axis=1), counts.shape[1] - 1)
+    rows = np.arange(len(b))
+    inside = counts[rows, b]
+
+    return b, cdf[rows, b] - inside, inside
+
+def stream_quantiles(da, quantiles, dims=('group','sample'), bins=1024, refine=2, max_bytes=2**28):
+
+    # histograms instead of a sort: extremes per cell, a histogram over them,
+    # then refine passes that re-bin only the bins holding the two order
+    # statistics each quantile interpolates between (numpy's linear method),
+    # so skewed data resolves to (max - min) / bins**(refine + 1); every pass
+    # reads the members once
+    stats = stream_stats(da, dims, max_bytes=max_bytes)
+    dims = [dim for dim in dims if dim in da.dims]
+    kept = [dim for dim in da.dims if dim not in dims]
+    sizes = da.sizes
+
+    # tiles of output cells: half the budget for the histograms (counts,
+    # bincount and cumsum per order statistic), half for member blocks and
+    # their index copies
+    per_cell = bins * 8 * 3 * 2 * max(len(quantiles), 1)
+    tile_cells = max((max_bytes // 2) // per_cell, 1)
+    tile_dim = max(kept, key=sizes.get) if kept else None
+    row = int(np.prod([sizes[dim] for dim in kept if dim != tile_dim]))
+    length = sizes[tile_dim] if tile_dim else 1
+    length = int(min(length, max(tile_cells // row, 1)))
+    run = int(max((max_bytes // 2) // (row * length * 8 * 5), 1))
+
+    shape = [sizes[dim] for dim in kept]
+    result = {q: np.empty(shape) for q in quantiles}
+    axis = kept.index(tile_dim) if tile_dim else None
+    starts = range(0, sizes[tile_dim], length) if tile_dim else [0]
+    for start in starts:
+        sel = {tile_dim: slice(start, start + length)} if tile_dim else {}
+        where = tuple(
+            slice(start, start + length) if i == axis else slice(None)
+            for i in range(len(kept))
+        )
+        tile_shape = stats['min'].values[where].shape
+        low = stats['min'].values[where].ravel()
+        high = stats['max'].values[where].ravel()
+        cells = len(low)
+        flat = ~(high > low)
+        width = np.where(flat, 1, (high - low) / bins)
+
+        def blocks():
+            for block in member_blocks(da, dims, kept, run, sel):
+                yield block.reshape(len(block), cells)
+
+        # one histogram over the full range serves every order statistic
+        counts = np.zeros((cells, bins), dtype=np.int64)
+        for block in blocks():
+            counts += bin_counts(block, low, width, bins, clip=True)[0]
+        total = counts.sum(axis=1)
+        none = np.zeros(cells, dtype=np.int64)
+        levels = {}
+        for q in quantiles:
+            rank = (total - 1) * q + 1
+            for side, target in enumerate([np.floor(rank), np.minimum(np.floor(rank) + 1, total)]):
+                levels[(q, side)] = (low, width, target) + crossing(counts, none, target)
+
+        # zoom into each crossing bin, recounting what lies below it
+        for i in range(refine):
+            zoom = {}
+            for key, (lo, w, target, b, before, inside) in levels.items():
+                zoom[key] = [lo + b * w, w / bins, np.zeros((cells, bins), dtype=np.int64), np.zeros(cells, dtype=np.int64)]
+            for block in blocks():
+                for level in zoom.values():
+                    counts, below = bin_counts(block, level[0], level[1], bins)
+                    level[2] += counts
+                    level[3] += below
+            for key, (lo, w, counts, below) in zoom.items():
+                target = levels[key][2]
+                levels[key] = (lo, w, target) + crossing(counts, below, target)
+
+        # each order statistic placed by its rank inside the last bin, then
+        # interpolated between like numpy's linear method
+        values = {}
+        for key, (lo, w, target, b, before, inside) in levels.items():
+            with np.errstate(invalid='ignore', divide='ignore'):
+                fraction = np.where(inside > 0, (target - before - 0.5) / inside, 0.5)
+            values[key] = lo + (b + np.clip(fraction, 0, 1)) * w
+        for q in quantiles:
+            rank = (total - 1) * q + 1
+            value = values[(q, 0)] + (rank - np.floor(rank)) * (values[(q, 1)] - values[(q, 0)])
+            value[flat] = low[flat]
+            value[total == 0] = np.nan
+            result[q][where] = value.reshape(tile_shape)
+
+    return result
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Ensemble statistics of a gridded variable with bounded memory.')
+    parser.add_argument('path')
+    parser.add_argument('var')
+    parser.add_argument('output', help='netcdf file for the statistics')
+    parser.add_argument('--dims', nargs='+', default=['group','sample'])
+    parser.add_argument('--by-group', action='store_true', help='keep one set of statistics per group')
+    parser.add_argument('--max-mb', type=float, default=256)
+    parser.add_argument('--threads', type=int, default=1)
+    args = parser.parse_args()
+
+    # plain lazy backend arrays: every isel below is a direct hyperslab read
+    ds = xr.open_dataset(args.path, cache=False)
+    stats = stream_stats(
+        ds[args.var],
+        dims = args.dims,
+        by_group = args.by_group,
+        max_bytes = int(args.max_mb * 2**20),
+        threads = args.threads
+    )
+    stats.to_netcdf(args.output)
+    ds.close()
+
+if __name__ == '__main__':
+    main()
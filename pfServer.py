@@ -0,0 +1,178 @@
+import io
+import json
+import queue
+import argparse
+import threading
+import numpy as np
+import matplotlib
+import matplotlib.image as mpimg
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pfAnimate import VIEWS, precompute, build_view
+from pfLoad import open_ensemble
+
+# scrubbing page: a slider over the frames of one view
+PAGE = '''<!doctype html>
+<html><head><meta charset="utf-8"><title>pf frames</title></head>
+<body style="font-family:sans-serif">
+<select id="view"></select>
+<input id="frame" type="range" min="0" value="0" style="width:60%">
+<span id="label"></span><br>
+<img id="image">
+<script>
+fetch('info').then(r => r.json()).then(info => {
+  const view = document.getElementById('view');
+  const frame = document.getElementById('frame');
+  info.views.forEach(v => view.add(new Option(v, v)));
+  frame.max = info.frames - 1;
+  const show = () => {
+    document.getElementById('label').textContent = info.labels[frame.value];
+    document.getElementById('image').src = view.value + '/' + frame.value + '.png';
+  };
+  frame.oninput = show;
+  view.onchange = show;
+  show();
+});
+</script>
+</body></html>
+'''
+
+def frame_renderer(ds, views, cache_size=64, prefetch=2, dpi=None, quality='final', window=None, bands=None, by_group=False):
+
+    # render any frame on demand, keeping the most recent ones in an lru cache
+    state = precompute(ds, views, quality, bands, by_group)
+    frames = len(state['dates'])
+    figures = {}
+    cache = OrderedDict()
+    lock = threading.Lock()
+
+    def draw(view, frame):
+
+        # one figure per view, built the first time it is asked for and drawn
+        # on its own agg canvas whatever backend the caller uses
+        if view not in figures:
+            fig, update = build_view(view, state, window=window)
+            FigureCanvasAgg(fig)
+            if dpi:
+                fig.set_dpi(dpi)
+            figures[view] = (fig, update)
+        fig, update = figures[view]
+        update(frame)
+        fig.canvas.draw()
+        buffer = io.BytesIO()
+        mpimg.imsave(buffer, np.asarray(fig.canvas.buffer_rgba()), format='png')
+
+        return buffer.getvalue()
+
+    def render(view, frame):
+
+        # matplotlib figures are not thread safe, so renders take turns
+        key = (view, frame)
+        with lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+            png = draw(view, frame)
+            cache[key] = png
+            while len(cache) > cache_size:
+                cache.popitem(last=False)
+
+        return png
+
+    # neighbors of the latest request are rendered in the background;
+    # requests queued for an older position are dropped
+    pending = queue.Queue()
+    latest = {'generation': 0}
+
+    def prefetcher():
+        while True:
+            generation, view, frame = pending.get()
+            if generation == latest['generation']:
+                render(view, frame)
+
+    threading.Thread(target=prefetcher, daemon=True).start()
+
+    def get(view, frame):
+        frame = min(max(frame, 0), frames - 1)
+        png = render(view, frame)
+        latest['generation'] += 1
+        for step in range(1, prefetch + 1):
+            for neighbor in (frame + step, frame - step):
+                if 0 <= neighbor < frames:
+                    pending.put((latest['generation'], view, neighbor))
+        return png
+
+    info = {
+        'views': list(views),
+        'frames': frames,
+        'labels': list(state['labels'])
+    }
+
+    return get, info
+
+def serve(ds, views=('burned','unburned','watershed'), host='127.0.0.1', port=8050, **options):
+
+    # local http server: /, /info and /<view>/<frame>.png
+    get, info = frame_renderer(ds, views, **options)
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def send(self, body, content_type, status=200):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parts = self.path.strip('/').split('/')
+            if parts == ['']:
+                self.send(PAGE.encode(), 'text/html')
+            elif parts == ['info']:
+                self.send(json.dumps(info).encode(), 'application/json')
+            elif len(parts) == 2 and parts[0] in info['views'] and parts[1].endswith('.png') and parts[1][:-4].isdigit():
+                self.send(get(parts[0], int(parts[1][:-4])), 'image/png')
+            else:
+                self.send(b'not found', 'text/plain', 404)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print('serving frames on http://%s:%d/' % (host, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def main():
+
+    # the standalone server never shows a window; library callers keep their backend
+    matplotlib.use('Agg')
+    parser = argparse.ArgumentParser(description='Serve animation frames on demand for scrubbing.')
+    parser.add_argument('path')
+    parser.add_argument('--views', nargs='+', default=['burned','unburned','watershed'], choices=list(VIEWS))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--cache-size', type=int, default=64, help='rendered frames kept in memory')
+    parser.add_argument('--prefetch', type=int, default=2, help='neighbors rendered ahead on each side')
+    parser.add_argument('--dpi', type=int, default=None)
+    parser.add_argument('--quality', default='final', choices=['final','preview'])
+    args = parser.parse_args()
+
+    serve(
+        open_ensemble(args.path),
+        views = args.views,
+        host = args.host,
+        port = args.port,
+        cache_size = args.cache_size,
+        prefetch = args.prefetch,
+        dpi = args.dpi,
+        quality = args.quality
+    )
+
+if __name__ == '__main__':
+    main()
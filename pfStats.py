@@ -0,0 +1,99 @@
+import xarray as xr
+import numpy as np
+from pfReduce import stream_quantiles
+
+def ensemble_means(ds, variables):
+
+    # reduce all requested variables over the ensemble in one pass
+    reduced = ds[variables].mean(dim=['group','sample']).compute()
+
+    # keep plain numpy series so per-frame slices are views
+    means = {}
+    for var in variables:
+        means[var] = np.asarray(reduced[var].values)
+
+    return means
+
+def group_means(ds, variables):
+
+    # one grouped reduction: every variable's (group, t) mean series at once
+    reduced = ds[variables].mean(dim='sample').compute()
+
+    return {
+        var: np.asarray(reduced[var].transpose('group','t').values)
+        for var in variables
+    }
+
+def ensemble_quantiles(ds, variables, quantiles):
+
+    # percentile series per variable, streamed rather than sorted per timestep
+    return {
+        var: stream_quantiles(ds[var], quantiles)
+        for var in variables
+    }
+
+def group_index(ds):
+
+    # position of each sampling group along the group axis
+    return {group: i for i, group in enumerate(ds.group.values)}
+
+def scatter_arrays(ds, pairs):
+
+    # interleave each (x, y) pair into one contiguous (t, group, sample, 2) block
+    arrays = {}
+    for x, y in pairs:
+        xv, yv = xr.broadcast(ds[x], ds[y])
+        arrays[(x, y)] = np.ascontiguousarray(np.stack([
+            xv.transpose('t','group','sample').values,
+            yv.transpose('t','group','sample').values
+        ], axis=-1))
+
+    return arrays
+
+def dense_points(arrays, groups):
+
+    # per-frame scatter data served as views into the precomputed blocks
+
+    def points(x, y, frame, group=None):
+        block = arrays[(x, y)][frame]
+        if group is None:
+            return block.reshape(-1, 2)
+        return block[groups[group]]
+
+    return points
+
+def snow_events(swe, threshold=0):
+
+    # peak is the snowiest step; melt-out is the first snow-free step after it
+    step = xr.DataArray(np.arange(swe.sizes['t']), dims='t')
+    peak = swe.argmax('t')
+    bare = (swe <= threshold) & (step > peak)
+    melted = bare.argmax('t').where(bare.any('t'), swe.sizes['t'] - 1)
+
+    return peak, melted
+
+def swe_events(ds, var, threshold=0):
+
+    # vectorized peak and melt-out per sample, per group and for the ensemble mean
+    swe = ds[var]
+    levels = {
+        'sample': swe,
+        'group': swe.mean(dim='sample'),
+        'ensemble': swe.mean(dim=['group','sample'])
+    }
+
+    # every level in one compute, so a lazy swe variable is read once
+    locs = xr.Dataset()
+    for level, da in levels.items():
+        locs[level + '_peak'], locs[level + '_melted'] = snow_events(da, threshold)
+    locs = locs.compute()
+
+    t = ds.t.values
+    events = xr.Dataset()
+    for level in levels:
+        for event in ['peak','melted']:
+            loc = locs[level + '_' + event]
+            events[level + '_' + event] = loc
+            events[level + '_' + event + '_date'] = loc.copy(data=t[loc.values])
+
+    return events
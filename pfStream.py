@@ -0,0 +1,178 @@
+import os
+import glob
+import shutil
+import subprocess
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+import matplotlib.image as mpimg
+from pfAnimate import precompute, build_panels
+from pfKeyframes import keyframes
+from pfCache import frame_cache, store, store_rgba, load_rgba
+from pfLoad import prefetched
+from pfProfile import NO_PROFILE
+
+def ffmpeg_pipe(output, size, fps=10, bitrate=None):
+
+    # ffmpeg process reading raw rgba frames on stdin
+    cmd = [
+        matplotlib.rcParams['animation.ffmpeg_path'],
+        '-y',
+        '-loglevel', 'error',
+        '-f', 'rawvideo',
+        '-pix_fmt', 'rgba',
+        '-s', '%dx%d' % size,
+        '-framerate', str(fps),
+        '-i', 'pipe:'
+    ]
+    if not output.endswith('.gif'):
+        cmd += [
+            '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+            '-pix_fmt', 'yuv420p'
+        ]
+    if bitrate:
+        cmd += ['-b:v', '%dk' % bitrate]
+
+    return subprocess.Popen(cmd + [output], stdin=subprocess.PIPE)
+
+def draw_png(fig, path, profile=NO_PROFILE):
+
+    # render the canvas and encode its buffer as a png
+    with profile.time('figure', 'draw'):
+        fig.canvas.draw()
+    with profile.time('figure', 'encode'):
+        mpimg.imsave(path, np.asarray(fig.canvas.buffer_rgba()))
+
+    return path
+
+def keyed(extract, lookup=None, profile=NO_PROFILE):
+
+    # a frame's cache key hashes the data extract has just read, so look it up
+    # on the extracting thread while the loaders still hold that frame; done
+    # on the drawing thread it would evict the frames extracted ahead
+    if lookup is None:
+        return lambda frame: (extract(frame), None)
+
+    def extract_keyed(frame):
+        data = extract(frame)
+        with profile.time('figure', 'cache', frame):
+            cached = lookup(frame)
+        return data, cached
+
+    return extract_keyed
+
+def render_png(fig, update, frame, path, cached=None, profile=NO_PROFILE):
+
+    # reuse a cached png when this frame's inputs were rendered before;
+    # cached is the (path, hit) pair from the cache lookup
+    profile.frame = frame
+    if cached is not None and cached[1]:
+        with profile.time('figure', 'cache'):
+            shutil.copyfile(cached[0], path)
+        return path
+
+    update(frame)
+    draw_png(fig, path, profile)
+    if cached is not None:
+        with profile.time('figure', 'cache'):
+            store(path, cached[0])
+
+    return path
+
+def render_rgba(canvas, update, frame, cached=None, profile=NO_PROFILE):
+
+    # same as render_png, returning the raw buffer for the ffmpeg pipe
+    profile.frame = frame
+    if cached is not None and cached[1]:
+        with profile.time('figure', 'cache'):
+            return load_rgba(cached[0])
+
+    update(frame)
+    with profile.time('figure', 'draw'):
+        canvas.draw()
+    rgba = canvas.buffer_rgba()
+    if cached is not None:
+        with profile.time('figure', 'cache'):
+            store_rgba(rgba, cached[0])
+
+    return rgba
+
+def clear_frames(frames_dir):
+
+    # a reused directory must not feed an earlier, longer render's
+    # trailing pngs to ffmpeg's frame_%05d pattern, nor an earlier keyframe
+    # run's concat list to a render without holds
+    for path in glob.glob(os.path.join(frames_dir, 'frame_*.png')):
+        os.remove(path)
+    concat = os.path.join(frames_dir, 'frames.txt')
+    if os.path.exists(concat):
+        os.remove(concat)
+
+def write_concat(frames_dir, holds, fps=10):
+
+    # ffmpeg concat list holding each png for as many frames as it stands in for
+    path = os.path.join(frames_dir, 'frames.txt')
+    with open(path, 'w') as f:
+        for index, hold in enumerate(holds):
+            f.write("file 'frame_%05d.png'\nduration %g\n" % (index, hold / fps))
+        f.write("file 'frame_%05d.png'\n" % (len(holds) - 1))
+
+    return path
+
+def stream(ds, view, output, frames=None, fps=10, dpi=None, bitrate=None, threshold=None, max_stride=10, quality='final', window=None, bands=None, by_group=False, cache_dir=None, prefetch=4, profile=NO_PROFILE):
+
+    # build the figure once and push one frame at a time to disk
+    state = precompute(ds, [view], quality, bands, by_group)
+    stride = 1
+    if frames is None:
+        stride = state['quality']['frame_stride']
+        frames = range(0, len(state['dates']), stride)
+
+    # adaptive mode: draw only visibly changed frames and hold them;
+    # a preview stride holds each frame as long as the steps it skips
+    if threshold is not None:
+        frames, holds = keyframes(state, view, frames, threshold=threshold, max_stride=max_stride, window=window)
+        holds = [hold * stride for hold in holds]
+    else:
+        holds = [stride] * len(frames)
+    fig, axes, extract, apply = build_panels(view, state, window=window, profile=profile)
+    if dpi:
+        fig.set_dpi(dpi)
+    canvas = fig.canvas
+
+    # frames whose inputs were already rendered come from the cache
+    lookup = None
+    if cache_dir:
+        lookup = frame_cache(cache_dir, state, view, window, dpi)
+    extract = keyed(extract, lookup, profile)
+
+    try:
+
+        # image sequence: a directory of numbered pngs
+        if not os.path.splitext(output)[1]:
+            os.makedirs(output, exist_ok=True)
+            clear_frames(output)
+            for index, (frame, (data, cached)) in enumerate(prefetched(extract, frames, prefetch)):
+                render_png(fig, lambda frame: apply(frame, data), frame, os.path.join(output, 'frame_%05d.png' % index), cached, profile)
+            if threshold is not None or stride > 1:
+                write_concat(output, holds, fps)
+
+        # video: raw rgba canvas buffers piped straight into ffmpeg
+        else:
+            canvas.draw()
+            proc = ffmpeg_pipe(output, canvas.get_width_height(), fps=fps, bitrate=bitrate)
+            try:
+                for (frame, (data, cached)), hold in zip(prefetched(extract, frames, prefetch), holds):
+                    rgba = render_rgba(canvas, lambda frame: apply(frame, data), frame, cached, profile)
+                    with profile.time('figure', 'encode'):
+                        for i in range(hold):
+                            proc.stdin.write(rgba)
+            finally:
+                proc.stdin.close()
+                if proc.wait():
+                    raise subprocess.CalledProcessError(proc.returncode, 'ffmpeg')
+
+    finally:
+        plt.close(fig)
+
+    return output
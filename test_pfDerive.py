@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import xarray as xr
+from pfDerive import derived_ensemble
+from pfStats import swe_events
+
+GROUPS = ['MPD','NN']
+SAMPLES = [1, 2, 3]
+
+def write_run(path, rng, steps=40, burned=None):
+
+    # one raw run: a seasonal snowpack, noisy fluxes and soil, and nan cells
+    # outside a domain mask
+    shape = (steps, 6, 5)
+    phase = 2 * np.pi * np.arange(steps) / steps
+    if burned is None:
+        burned = rng.random(shape[1:]) < 0.4
+    mask = np.ones(shape[1:])
+    mask[0] = 0
+    soil = 280 + 100 * np.cos(phase)[:, None, None] + rng.normal(0, 1, shape)
+    soil[:, 0] = np.nan
+    xr.Dataset({
+        'runoff': (('t','y','x'), 2 + rng.random(shape)),
+        'soil': (('t','y','x'), soil),
+        'et': (('t','y','x'), rng.random(shape)),
+        'swe': (('t','y','x'), 600 * np.clip(np.sin(phase - 0.5), 0, None)[:, None, None] + rng.random(shape)),
+        'burned': (('y','x'), burned.astype('i1')),
+        'mask': (('y','x'), mask),
+        'downstream_cells': ((), rng.uniform(0, 300))
+    }, coords={'t': pd.date_range('2005-10-01', periods=steps)}).to_netcdf(path)
+
+class DeriveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.pattern = os.path.join(self.dir, '{group}', '{sample}.nc')
+        self.output = os.path.join(self.dir, 'derived.nc')
+        rng = np.random.default_rng(0)
+        for group in GROUPS:
+            os.makedirs(os.path.join(self.dir, group))
+            for sample in SAMPLES:
+                write_run(self.pattern.format(group=group, sample=sample), rng)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_matches_per_run_means(self):
+        ds = derived_ensemble(self.pattern, GROUPS, SAMPLES, self.output, scale=2.0, t_chunk=8)
+        try:
+            for group in GROUPS:
+                for sample in SAMPLES:
+                    with xr.open_dataset(self.pattern.format(group=group, sample=sample)) as raw:
+                        burned = (raw.burned > 0) & (raw.mask > 0)
+                        unburned = ~burned & (raw.mask > 0)
+                        soil = 2 * raw.soil.where(burned).mean(['y','x']).values
+                        runoff = 2 * np.cumsum(raw.runoff.where(unburned).mean(['y','x']).values)
+                        run = ds.sel(group=group, sample=sample)
+                        np.testing.assert_allclose(run.soil_burned, soil - soil[0], atol=1e-9)
+                        np.testing.assert_allclose(run.init_soil_burned, soil[0])
+                        np.testing.assert_allclose(run.net_runoff_unburned, runoff)
+                        self.assertEqual(float(run.downstream_cells), float(raw.downstream_cells))
+
+            # anomalies against the ensemble mean of each step
+            mean = ds.et_watershed.mean(['group','sample'])
+            np.testing.assert_allclose(ds.norm_et_watershed, ds.et_watershed - mean, atol=1e-12)
+
+            # marker dates stored with the data agree with detection on it
+            events = swe_events(ds, 'swe_burned')
+            for event in ['peak','melted']:
+                self.assertEqual(pd.Timestamp(ds.swe_burned.attrs[event]), pd.Timestamp(events['ensemble_' + event + '_date'].values))
+        finally:
+            ds.close()
+
+    def test_reuses_current_store(self):
+        derived_ensemble(self.pattern, GROUPS, SAMPLES, self.output).close()
+        written = os.path.getmtime(self.output)
+        derived_ensemble(self.pattern, GROUPS, SAMPLES, self.output).close()
+        self.assertEqual(os.path.getmtime(self.output), written)
+        derived_ensemble(self.pattern, GROUPS, SAMPLES, self.output, scale=2.0).close()
+        self.assertNotEqual(os.path.getmtime(self.output), written)
+
+    def test_rejects_empty_footprint(self):
+        write_run(self.pattern.format(group='NN', sample=2), np.random.default_rng(1), burned=np.zeros((6, 5), bool))
+        with self.assertRaisesRegex(ValueError, 'burned NN/2'):
+            derived_ensemble(self.pattern, GROUPS, SAMPLES, self.output)
+        self.assertEqual(sorted(os.listdir(self.dir)), GROUPS)
+
+if __name__ == '__main__':
+    unittest.main()
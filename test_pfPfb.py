@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from pfPfb import open_pfb, pfb_index
+
+def write_pfb(path, data, parts=(2, 2, 1), origin=(0.0, 0.0, 0.0), spacing=(10.0, 20.0, 2.0)):
+
+    # (z, y, x) cells split into px * py * pz subgrids, written as parflow does
+    nz, ny, nx = data.shape
+    px, py, pz = parts
+    with open(path, 'wb') as f:
+        np.array(origin, '>f8').tofile(f)
+        np.array([nx, ny, nz], '>i4').tofile(f)
+        np.array(spacing, '>f8').tofile(f)
+        np.array([px * py * pz], '>i4').tofile(f)
+        for zs in np.array_split(np.arange(nz), pz):
+            for ys in np.array_split(np.arange(ny), py):
+                for xs in np.array_split(np.arange(nx), px):
+                    np.array([xs[0], ys[0], zs[0], len(xs), len(ys), len(zs), 0, 0, 0], '>i4').tofile(f)
+                    data[zs[0]:zs[-1] + 1, ys[0]:ys[-1] + 1, xs[0]:xs[-1] + 1].astype('>f8').tofile(f)
+
+class OpenPfbTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.truth = np.random.default_rng(0).random((6, 3, 20, 16))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, data, parts=None):
+        for i, step in enumerate(data):
+            write_pfb(os.path.join(self.dir, 'run.out.%s.%05d.pfb' % (name, i + 1)), step, *([parts(i)] if parts else []))
+        return os.path.join(self.dir, 'run.out.%s.*.pfb' % name)
+
+    def test_reads_match(self):
+        pattern = self.write('press', self.truth, lambda i: (3, 2, 2))
+        ds = open_pfb({'press': pattern})
+        np.testing.assert_array_equal(ds.press.values, self.truth)
+        np.testing.assert_array_equal(ds.press.isel(t=4, z=1).values, self.truth[4, 1])
+        np.testing.assert_array_equal(
+            ds.press.isel(t=[3, 1], y=slice(2, 19, 3), x=[15, 0, 7]).values,
+            self.truth[[3, 1]][:, :, 2:19:3][..., [15, 0, 7]]
+        )
+        np.testing.assert_allclose(ds.x.values[:2], [5.0, 15.0])
+        np.testing.assert_array_equal(ds.t.values, np.arange(1, 7))
+
+    def test_without_dask_chunks(self):
+        pattern = self.write('press', self.truth)
+        ds = open_pfb({'press': pattern}, t_chunk=None)
+        np.testing.assert_array_equal(ds.press.isel(t=2, x=slice(3, 11)).values, self.truth[2, :, :, 3:11])
+
+    def test_decomposition_changes(self):
+        # a restart on another process layout can keep the file size but not
+        # the subgrid offsets, so each file's own headers must decide
+        pattern = self.write('satur', self.truth, lambda i: (4, 1, 1) if i == 3 else (2, 2, 1))
+        paths = sorted(os.listdir(self.dir))
+        sizes = [os.path.getsize(os.path.join(self.dir, path)) for path in paths]
+        self.assertEqual(sizes[2], sizes[3])
+        ds = open_pfb({'satur': pattern}, t_chunk=None)
+        np.testing.assert_array_equal(ds.satur.values, self.truth)
+
+    def test_rejects_bad_files(self):
+        pattern = self.write('press', self.truth)
+        path = os.path.join(self.dir, 'run.out.press.00001.pfb')
+
+        # trailing bytes mean the headers do not describe the file
+        with open(path, 'ab') as f:
+            f.write(b'\0' * 8)
+        with self.assertRaises(ValueError):
+            pfb_index(path)
+
+        # the first file sets the grid; a later one on another grid is refused on read
+        write_pfb(path, self.truth[0, :, :, :8])
+        ds = open_pfb({'press': pattern}, t_chunk=None)
+        with self.assertRaises(ValueError):
+            ds.press.isel(t=1).values
+        with self.assertRaises(FileNotFoundError):
+            open_pfb({'press': os.path.join(self.dir, 'missing.*.pfb')})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import warnings
+import numpy as np
+import xarray as xr
+from pfReduce import stream_stats, stream_quantiles
+
+def ensemble(shape=(3, 7, 5, 4), seed=0):
+
+    # (group, sample, y, x) members with a few missing values and one all-nan cell
+    rng = np.random.default_rng(seed)
+    values = rng.normal(300, 20, shape)
+    values[rng.random(shape) < 0.1] = np.nan
+    values[..., 0, 0] = np.nan
+    return xr.DataArray(
+        values,
+        dims = ('group','sample','y','x'),
+        coords = {'group': ['MPD','NN','R'][:shape[0]], 'sample': np.arange(1, shape[1] + 1)}
+    )
+
+class StreamStatsTest(unittest.TestCase):
+
+    def check(self, da, dims, **options):
+        stats = stream_stats(da, dims, **options)
+        dims = [dim for dim in dims if not (options.get('by_group') and dim == 'group')]
+        ddof = options.get('ddof', 0)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            np.testing.assert_allclose(stats['mean'], da.mean(dims), rtol=1e-12)
+            np.testing.assert_allclose(stats['var'], da.var(dims, ddof=ddof), rtol=1e-10)
+            np.testing.assert_allclose(stats['min'], da.min(dims))
+            np.testing.assert_allclose(stats['max'], da.max(dims))
+        np.testing.assert_array_equal(stats['count'], da.count(dims))
+        return stats
+
+    def test_matches_numpy(self):
+        da = ensemble()
+        for options in [{}, {'threads': 3}, {'max_bytes': 64}, {'by_group': True}, {'ddof': 1}]:
+            with self.subTest(**options):
+                stats = self.check(da, ['group','sample'], **options)
+                self.assertTrue(np.isnan(stats['mean'].values[..., 0, 0]).all())
+
+    def test_every_dim_reduced(self):
+        # a 0-d result, e.g. an initial condition reduced over the whole grid
+        da = ensemble()
+        stats = self.check(da, ['group','sample','y','x'], max_bytes=256)
+        self.assertEqual(stats['mean'].ndim, 0)
+        stats = self.check(da.isel(y=0, x=0), ['group','sample'])
+        self.assertTrue(np.isnan(stats['mean'].values))
+        self.assertEqual(int(stats['count']), 0)
+
+class StreamQuantilesTest(unittest.TestCase):
+
+    # histogram refinement resolves each order statistic to a width of
+    # range / bins**(refine + 1), far below these tolerances
+    levels = [0, 0.05, 0.25, 0.5, 0.75, 0.95, 1]
+
+    def check(self, da, dims=('group','sample'), rtol=1e-6, **options):
+        result = stream_quantiles(da, self.levels, dims, **options)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            expected = da.quantile(self.levels, dim=list(dims)).values
+        scale = float(da.max() - da.min()) or 1.0
+        for i, q in enumerate(self.levels):
+            with self.subTest(q=q):
+                np.testing.assert_allclose(result[q], expected[i], rtol=0, atol=rtol * scale)
+        return result
+
+    def test_skewed(self):
+        # lognormal tails put most members in a few bins of the first pass
+        rng = np.random.default_rng(1)
+        da = xr.DataArray(rng.lognormal(0, 1.5, (3, 2000, 6)), dims=('group','sample','t'))
+        result = self.check(da)
+        expected = da.quantile(0.5, dim=['group','sample']).values
+        np.testing.assert_allclose(result[0.5], expected, rtol=1e-5)
+
+    def test_few_members(self):
+        rng = np.random.default_rng(2)
+        for n in [1, 2, 3]:
+            with self.subTest(n=n):
+                self.check(xr.DataArray(rng.normal(size=(1, n, 4)), dims=('group','sample','t')))
+
+    def test_missing_and_constant(self):
+        da = ensemble().isel(x=slice(0, 2))
+        result = self.check(da)
+        self.assertTrue(np.isnan(result[0.5][0, 0]))
+        constant = xr.DataArray(np.full((2, 5, 3), 7.0), dims=('group','sample','t'))
+        constant[0, 0, 1] = np.nan
+        result = self.check(constant)
+        np.testing.assert_array_equal(result[0.25], 7.0)
+
+    def test_ties(self):
+        rng = np.random.default_rng(3)
+        da = xr.DataArray(rng.integers(0, 4, (3, 50, 5)).astype(float), dims=('group','sample','t'))
+        self.check(da)
+
+    def test_tiny_budget(self):
+        # one cell per tile and one member per block
+        da = ensemble(seed=4)
+        self.check(da, max_bytes=1)
+        self.check(da, dims=('group','sample','y','x'), max_bytes=1)
+
+if __name__ == '__main__':
+    unittest.main()